@@ -103,7 +103,7 @@ def update_config(creds: dict, dry_run=False) -> dict:
         sys.exit(1)
 
     with open(CONFIG_PATH) as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
     ftp = config.setdefault("ftp", {})
 
@@ -11,27 +11,67 @@ Tests:
      AT+CIPQSEND=1 used: SEND OK returns as soon as modem tx buffer is free,
      before waiting for server ACK, so this measures max upload rate.
 """
-import os, sys, time, serial, yaml, argparse
+import os, re, sys, time, select, serial, yaml, argparse
 
 CONFIG = os.path.expanduser('~/config.yaml')
 FTP_TEST_SIZES = [1360, 2720, 4096, 8192, 16384, 32768, 65536]
 TCP_TEST_SIZES = [512, 1024, 1460, 2048, 4096, 16384, 65536]
 PAYLOAD = bytes(range(256)) * 1024  # 256 KB of test data
+# Zero-copy slices of PAYLOAD for each send (pyserial writes any buffer).
+PAYLOAD_VIEW = memoryview(PAYLOAD)
+# FTPPUT replies carrying a length; matching through the line end means a
+# read that stops mid-number can't yield a truncated value.
+RE_FTPPUT_OPEN = re.compile(rb'\+FTPPUT: 1,1,(\d+)\r\n')
+RE_FTPPUT_DATA = re.compile(rb'\+FTPPUT: 2,(\d+)\r\n')
+
+
+def open_serial(mc):
+    # exclusive: fail fast if the airbridge service (or another test) still
+    # holds the modem, rather than interleaving AT traffic with it.
+    ser = serial.Serial(mc['port'], mc['baudrate'], timeout=1, exclusive=True)
+    try:
+        # USB-serial adapters otherwise batch input for up to 16 ms.
+        ser.set_low_latency_mode(True)
+    except (AttributeError, OSError, ValueError):
+        pass
+    return ser
+
+
+def wait_match(ser, pattern, timeout=20, overlap=31):
+    # Block in select() until the UART has bytes instead of sleep-polling, and
+    # only rescan the newly appended tail (plus *overlap* bytes for a match
+    # split across reads).  Raw bytes accumulate in a bytearray and are
+    # decoded once on return.  Returns (match or None, text).
+    end = time.time() + timeout
+    buf = bytearray()
+    scan_from = 0
+    while True:
+        remaining = end - time.time()
+        if remaining <= 0:
+            return None, buf.decode(errors='ignore')
+        if not ser.in_waiting:
+            select.select([ser.fileno()], [], [], remaining)
+            continue
+        buf += ser.read(ser.in_waiting)
+        m = pattern.search(buf, scan_from)
+        if m:
+            return m, buf.decode(errors='ignore')
+        if buf.find(b'ERROR', scan_from) >= 0:
+            return None, buf.decode(errors='ignore')
+        scan_from = max(0, len(buf) - max(overlap, len(b'ERROR') - 1))
 
 
 def wait(ser, tok, timeout=20):
-    end = time.time() + timeout
-    buf = ''
-    while time.time() < end:
-        if ser.in_waiting:
-            buf += ser.read(ser.in_waiting).decode(errors='ignore')
-            if tok in buf:
-                return True, buf
-            if 'ERROR' in buf:
-                return False, buf
-        else:
-            time.sleep(0.01)
-    return False, buf
+    m, text = wait_match(ser, re.compile(re.escape(tok.encode())), timeout,
+                         len(tok) - 1)
+    return m is not None, text
+
+
+def drain(ser, idle=0.1):
+    # Discard pending bytes until the UART has been quiet for *idle* seconds,
+    # waking on select() rather than sleeping a fixed worst-case delay.
+    while select.select([ser.fileno()], [], [], idle)[0] or ser.in_waiting:
+        ser.read(ser.in_waiting or 1)
 
 
 def at(ser, cmd, tok='OK', t=5, quiet=False):
@@ -44,9 +84,31 @@ def at(ser, cmd, tok='OK', t=5, quiet=False):
     return ok, r
 
 
+def at_batch(ser, cmds, t=5):
+    # Chain set-up commands onto one ';'-joined AT line so the whole batch
+    # costs one write and one OK round-trip instead of one per command.
+    # Firmware that rejects chaining gets the commands one at a time.
+    ok, r = at(ser, ';'.join([cmds[0]] + [c[2:] for c in cmds[1:]]), t=t, quiet=True)
+    if ok:
+        return ok, r
+    results = [at(ser, c, t=t, quiet=True) for c in cmds]
+    return all(ok for ok, _ in results), ''.join(r for _, r in results)
+
+
+def bearer_up(ser):
+    # +SAPBR: 1,<status>,"<ip>" — status 1 means the bearer is connected.
+    ok, r = at(ser, 'AT+SAPBR=2,1', t=3, quiet=True)
+    return ok and '+SAPBR: 1,1,' in r
+
+
 def setup_sapbr(ser, apn):
     print('\n[Network / SAPBR bearer]')
     at(ser, 'AT', quiet=True)
+    if bearer_up(ser):
+        # Left open by a previous --keep-bearer run: skip the PDP re-attach.
+        at(ser, 'AT+FTPSTOP', t=3, quiet=True)
+        print('  SAPBR bearer already open — reusing it')
+        return True
     at(ser, 'AT+CFUN=1', t=10, quiet=True)
     at(ser, 'AT+FTPSTOP', t=3, quiet=True)
     at(ser, 'AT+SAPBR=0,1', t=5, quiet=True)
@@ -57,8 +119,7 @@ def setup_sapbr(ser, apn):
             break
         print(f'  waiting for network ({i+1}/15)...')
         time.sleep(2)
-    at(ser, 'AT+SAPBR=3,1,"Contype","GPRS"', quiet=True)
-    at(ser, f'AT+SAPBR=3,1,"APN","{apn}"', quiet=True)
+    at_batch(ser, ['AT+SAPBR=3,1,"Contype","GPRS"', f'AT+SAPBR=3,1,"APN","{apn}"'])
     ok, r = at(ser, 'AT+SAPBR=1,1', t=20, quiet=True)
     if not ok:
         print(f'  Bearer FAILED: {r.strip()}')
@@ -69,19 +130,17 @@ def setup_sapbr(ser, apn):
 
 def print_network_info(ser):
     print('\n[Network info]')
-    _, r = at(ser, 'AT+CSQ', t=3, quiet=True)
+    _, r = at_batch(ser, ['AT+CSQ', 'AT+CPSI?'], t=3)
     for line in r.splitlines():
         if '+CSQ' in line:
             print(f'  Signal:  {line.strip()}')
-    _, r = at(ser, 'AT+CPSI?', t=3, quiet=True)
-    for line in r.splitlines():
-        if '+CPSI' in line:
+        elif '+CPSI' in line:
             print(f'  Network: {line.strip()}')
 
 
 def test_ftp_chunks(ser, ftp_cfg):
     print('\n[FTP chunk size test]')
-    for cmd in [
+    at_batch(ser, [
         'AT+FTPCID=1',
         f'AT+FTPSERV="{ftp_cfg["server"]}"',
         f'AT+FTPPORT={ftp_cfg["port"]}',
@@ -92,17 +151,16 @@ def test_ftp_chunks(ser, ftp_cfg):
         f'AT+FTPPUTPATH="{ftp_cfg.get("remote_path", "/")}"',
         'AT+FTPTYPE="I"',
         'AT+FTPPUTOPT="STOR"',
-    ]:
-        at(ser, cmd, quiet=True)
+    ])
 
     ser.reset_input_buffer()
     ser.write(b'AT+FTPPUT=1\r\n')
-    ok, resp = wait(ser, '+FTPPUT: 1,1', timeout=30)
-    if not ok:
+    m, resp = wait_match(ser, RE_FTPPUT_OPEN, timeout=30)
+    if not m:
         print(f'  FTP session open FAILED: {resp!r}')
         return []
 
-    modem_max = int(resp.strip().split(',')[-1])
+    modem_max = int(m.group(1))
     print(f'  Modem initial reported max: {modem_max} bytes')
     print()
     print(f'  {"Requested":>10}  {"Accepted":>10}  {"Time":>10}  {"KB/s":>10}')
@@ -112,17 +170,14 @@ def test_ftp_chunks(ser, ftp_cfg):
     for req in FTP_TEST_SIZES:
         ser.reset_input_buffer()
         ser.write(f'AT+FTPPUT=2,{req}\r\n'.encode())
-        ok, resp = wait(ser, '+FTPPUT: 2,', timeout=10)
-        if not ok:
+        m, resp = wait_match(ser, RE_FTPPUT_DATA, timeout=10)
+        if not m:
             print(f'  {req:>10}  {"REFUSED":>10}  (modem cap confirmed at {modem_max} B)')
             break
-        try:
-            accepted = int(resp.strip().split('+FTPPUT: 2,')[-1].split()[0])
-        except Exception:
-            accepted = modem_max
+        accepted = int(m.group(1))
 
         t0 = time.time()
-        ser.write(PAYLOAD[:accepted])
+        ser.write(PAYLOAD_VIEW[:accepted])
         wait(ser, 'OK', timeout=15)
         wait(ser, '+FTPPUT: 1,1', timeout=15)
         elapsed = time.time() - t0
@@ -138,15 +193,20 @@ def test_ftp_chunks(ser, ftp_cfg):
     return results
 
 
-def send_chunk_tcp(ser, data, timeout=30):
+def cipsend_header(n):
+    return f'AT+CIPSEND={n}\r\n'.encode()
+
+
+def send_chunk_tcp(ser, data, timeout=30, header=None):
     """
     Send one chunk via AT+CIPSEND in CIPQSEND=1 mode.
     Returns (ok, elapsed_seconds).
     With CIPQSEND=1 the response token is 'DATA ACCEPT' not 'SEND OK'.
+    Pass a prebuilt *header* (cipsend_header(len(data))) when sending the
+    same size repeatedly.
     """
-    n = len(data)
     ser.reset_input_buffer()
-    ser.write(f'AT+CIPSEND={n}\r\n'.encode())
+    ser.write(header or cipsend_header(len(data)))
     ok, _ = wait(ser, '>', timeout=10)
     if not ok:
         return False, 0.0
@@ -184,11 +244,9 @@ def test_raw_tcp(ser, host, port, apn):
         if '.' in line and line.strip():
             print(f'  Modem IP: {line.strip()}')
 
-    # Override DNS — carrier DNS may not resolve dynamic tunnel hostnames
-    at(ser, 'AT+CDNSCFG="8.8.8.8","8.8.4.4"', quiet=True)
-
+    # Override DNS — carrier DNS may not resolve dynamic tunnel hostnames.
     # Quick-send mode: DATA ACCEPT returns after modem TX buffer drains (no server ACK wait)
-    at(ser, 'AT+CIPQSEND=1', quiet=True)
+    at_batch(ser, ['AT+CDNSCFG="8.8.8.8","8.8.4.4"', 'AT+CIPQSEND=1'])
 
     ok, r = at(ser, f'AT+CIPSTART="TCP","{host}",{port}', tok='CONNECT', t=30)
     if 'CONNECT OK' not in r and 'ALREADY CONNECT' not in r:
@@ -198,15 +256,14 @@ def test_raw_tcp(ser, host, port, apn):
     print('  TCP connected')
 
     # Drain any unsolicited data after CONNECT OK
-    time.sleep(0.3)
-    ser.read(ser.in_waiting)
+    drain(ser)
 
     # --- Phase 1: find max bytes per CIPSEND ---
     print('\n  [Finding per-send size limit]')
     PROBE_SIZES = [512, 1024, 1460, 2048, 4096]
     max_chunk = 0
     for probe in PROBE_SIZES:
-        ok, elapsed = send_chunk_tcp(ser, PAYLOAD[:probe])
+        ok, elapsed = send_chunk_tcp(ser, PAYLOAD_VIEW[:probe])
         flag = 'OK' if ok else 'ERROR'
         print(f'    CIPSEND={probe:5d} → {flag}' + (f'  ({elapsed:.2f}s)' if ok else ''))
         if ok:
@@ -229,10 +286,14 @@ def test_raw_tcp(ser, host, port, apn):
     print(f'  {"-"*6}  {"-"*6}  {"-"*8}  {"-"*8}  {"-"*8}')
 
     results = []
+    # Every send is the same size: build the header and slice the payload
+    # once, outside the timed loop.
+    header = cipsend_header(max_chunk)
+    chunk = PAYLOAD[:max_chunk]
     t_start = time.time()
     sent = 0
     for i in range(n_sends):
-        ok, _ = send_chunk_tcp(ser, PAYLOAD[:max_chunk])
+        ok, _ = send_chunk_tcp(ser, chunk, header=header)
         if not ok:
             print(f'    send #{i+1} failed — stopping')
             break
@@ -254,13 +315,15 @@ if __name__ == '__main__':
     parser.add_argument('--tcp-port', type=int, default=None, help='TCP tunnel port')
     parser.add_argument('--ftp-only', action='store_true')
     parser.add_argument('--tcp-only', action='store_true')
+    parser.add_argument('--keep-bearer', action='store_true',
+                        help='leave the SAPBR bearer open for the next run')
     args = parser.parse_args()
 
     with open(CONFIG) as f:
-        cfg = yaml.safe_load(f)
+        cfg = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
 
     mc = cfg['modem']
-    ser = serial.Serial(mc['port'], mc['baudrate'], timeout=1)
+    ser = open_serial(mc)
     print(f'Opened {mc["port"]} @ {mc["baudrate"]} baud')
 
     ftp_results = []
@@ -280,7 +343,8 @@ if __name__ == '__main__':
     finally:
         at(ser, 'AT+FTPSTOP', t=3, quiet=True)
         at(ser, 'AT+CIPSHUT', t=3, quiet=True)
-        at(ser, 'AT+SAPBR=0,1', t=5, quiet=True)
+        if not args.keep_bearer:
+            at(ser, 'AT+SAPBR=0,1', t=5, quiet=True)
         ser.close()
 
     # Summary
@@ -290,6 +354,11 @@ if __name__ == '__main__':
     if ftp_results:
         best_ftp = max(ftp_results, key=lambda x: x[3])
         print(f'FTP best:     {best_ftp[1]:6d} B/chunk → {best_ftp[3]:.1f} KB/s')
+        # Largest payload the modem took in one AT+FTPPUT=2: uploader chunks
+        # should be this size, since anything bigger is cut down anyway and
+        # anything smaller costs extra AT round trips per MB.
+        window = max(r[1] for r in ftp_results)
+        print(f'FTP window:   {window:6d} B per AT+FTPPUT=2 (use as upload chunk size)')
     if tcp_results:
         # tcp_results tuples: (max_chunk, n_sends, total_bytes, elapsed, kbps)
         best_tcp = max(tcp_results, key=lambda x: x[4])
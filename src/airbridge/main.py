@@ -15,7 +15,10 @@ once any connection is available the AP is torn down automatically.
 import os
 import sys
 import time
-import yaml
+import errno
+import ctypes
+import ctypes.util
+import select
 import shutil
 import struct
 import threading
@@ -32,16 +35,41 @@ logging.basicConfig(
 )
 log = logging.getLogger('airbridge')
 
-# Load configuration – try flat home-dir deployment first, then project tree
-for _p in ("/home/cedric/config.yaml", "/home/cedric/USBCellular/config.yaml"):
-    if os.path.exists(_p):
+# Load configuration – $AIRBRIDGE_CONFIG if set, else try flat home-dir
+# deployment first, then project tree
+for _p in (os.environ.get("AIRBRIDGE_CONFIG"),
+           "/home/cedric/config.yaml", "/home/cedric/USBCellular/config.yaml"):
+    if _p and os.path.exists(_p):
         CONFIG_PATH = _p
         break
 else:
     raise FileNotFoundError("config.yaml not found in ~ or project tree")
 
-with open(CONFIG_PATH, "r") as ymlfile:
-    cfg = yaml.safe_load(ymlfile)
+
+def _load_config():
+    """Parse CONFIG_PATH.  yaml is imported here: it is needed exactly once."""
+    import yaml
+    try:
+        loader = yaml.CSafeLoader      # libyaml C parser
+    except AttributeError:
+        loader = yaml.SafeLoader       # PyYAML built without libyaml
+    with open(CONFIG_PATH, "r") as ymlfile:
+        return yaml.load(ymlfile, Loader=loader)
+
+
+cfg = _load_config()
+
+# Hot config values, bound once so the monitor and upload loops do no
+# repeated dict lookups.
+VIRTUAL_DISK_PATH = cfg['virtual_disk_path']
+MOUNT_POINT       = cfg['mount_point']
+OUTBOX_DIR        = cfg['outbox_dir']
+QUIET_WINDOW      = cfg['quiet_window_seconds']
+FTP_CFG           = cfg['ftp']
+HTTP_CFG          = cfg.get('http_upload', {})
+UPLOAD_METHOD     = cfg.get('upload_method', 'ftp')
+AP_SSID           = cfg.get('wifi_ap', {}).get('ssid', 'AirBridge')
+DISK_FSTYPE       = cfg.get('fs_type', 'vfat')
 
 # ── Module-level singletons ────────────────────────────────────────────────────
 
@@ -96,20 +124,88 @@ def _poll_wifi_status():
         log.warning(f"WiFi status poll failed: {exc}")
 
 
+WIFI_STATUS_INTERVAL = 30   # s between background WiFi status polls
+
+
+def wifi_status_worker():
+    """
+    Daemon thread: refresh WiFi status in _ds on its own cadence.  nmcli and
+    the connectivity probe can each block for seconds, so they stay off the
+    main loop, which just displays whatever was last published.
+    """
+    while True:
+        time.sleep(WIFI_STATUS_INTERVAL)
+        _poll_wifi_status()
+
+
 # ── USB / UDC helpers ─────────────────────────────────────────────────────────
 
-def get_udc_state():
-    """Get the current USB Device Controller state."""
+# The UDC "state" attribute is kept open so the main loop can poll() it: the
+# kernel calls sysfs_notify() on every gadget state change (attach, configure,
+# suspend, detach), which wakes a POLLPRI waiter immediately.  Lazily opened
+# because the UDC only appears once dwc2 is bound.
+_udc_fd   = -1
+_udc_poll = None
+# Set once the open failure has been logged at warning level; later retries
+# (several per loop iteration) log at debug so the journal isn't flooded.
+_udc_warned = False
+
+# Main-loop wait while the host is configured.  Write sectors have no sysfs
+# notification, so they are still sampled at this cadence.
+ACTIVE_WAIT_S = 1.0
+# Main-loop wait while no host is attached — host connect wakes us early.
+IDLE_WAIT_S   = 5.0
+# Minimum spacing of "Write activity" log lines during a long host copy;
+# bytes seen in between are folded into the next line.
+WRITE_LOG_INTERVAL = 5.0
+
+
+def _udc_open():
+    """Open and register the UDC state attribute. Returns True if available."""
+    global _udc_fd, _udc_poll, _udc_warned
+    if _udc_fd >= 0:
+        return True
     try:
         udc_dirs = os.listdir("/sys/class/udc/")
-        if udc_dirs:
-            with open(f"/sys/class/udc/{udc_dirs[0]}/state", 'r') as f:
-                return f.read().strip()
-    except Exception as e:
-        log.warning(f"Could not read UDC state: {e}")
+        if not udc_dirs:
+            raise FileNotFoundError("no UDC registered in /sys/class/udc")
+        _udc_fd = os.open(f"/sys/class/udc/{udc_dirs[0]}/state", os.O_RDONLY)
+    except OSError as e:
+        if _udc_warned:
+            log.debug(f"Could not open UDC state: {e}")
+        else:
+            log.warning(f"Could not open UDC state: {e}")
+            _udc_warned = True
+        return False
+    _udc_warned = False
+    _udc_poll = select.poll()
+    _udc_poll.register(_udc_fd, select.POLLPRI | select.POLLERR)
+    return True
+
+
+def get_udc_state():
+    """Get the current USB Device Controller state."""
+    if _udc_open():
+        try:
+            # Reading from offset 0 also re-arms the sysfs_notify() wakeup.
+            return os.pread(_udc_fd, 64, 0).decode().strip()
+        except OSError as e:
+            log.warning(f"Could not read UDC state: {e}")
     return "unknown"
 
 
+def wait_udc_event(timeout):
+    """
+    Block until the UDC state changes or *timeout* seconds elapse.
+    Falls back to a plain sleep when the UDC attribute is unavailable.
+    Returns True if woken by a state change.
+    """
+    if not _udc_open():
+        time.sleep(timeout)
+        return False
+    return bool(_udc_poll.poll(timeout * 1000))
+
+
 def get_fat32_disk_info():
     """
     Read FAT32 boot sector and FSInfo to determine used and total space.
@@ -118,9 +214,8 @@ def get_fat32_disk_info():
     Returns (used_mb, total_mb) as floats.
     Returns (-1.0, -1.0) if the read fails or FSInfo is stale/unavailable.
     """
-    device = cfg['virtual_disk_path']
     try:
-        with open(device, 'rb') as f:
+        with open(VIRTUAL_DISK_PATH, 'rb') as f:
             boot = f.read(512)
             if len(boot) < 512:
                 return -1.0, -1.0
@@ -162,49 +257,112 @@ def get_fat32_disk_info():
         return -1.0, -1.0
 
 
+def _disk_stat_path():
+    """Return the sysfs I/O stat path for the virtual disk partition, or None."""
+    if not VIRTUAL_DISK_PATH.startswith('/dev/'):
+        return None
+
+    part_name = VIRTUAL_DISK_PATH.replace('/dev/', '')
+    if 'mmcblk' in part_name:
+        disk_name = part_name.rstrip('0123456789').rstrip('p')
+    else:
+        disk_name = part_name.rstrip('0123456789')
+    return f"/sys/block/{disk_name}/{part_name}/stat"
+
+
+# Resolved once; the stat file is opened on first use and kept open so each
+# poll is a single pread() (sysfs regenerates the content on every read).
+_STAT_PATH = _disk_stat_path()
+_stat_fd   = -1
+
+
 def get_disk_write_sectors():
     """
     Get the cumulative write sectors from disk I/O stats.
     Returns the number of 512-byte sectors written, or -1 on error.
     """
-    disk_path = cfg['virtual_disk_path']
-
-    if not disk_path.startswith('/dev/'):
+    global _stat_fd
+    if _STAT_PATH is None:
         return -1
 
-    part_name = disk_path.replace('/dev/', '')
-    if 'mmcblk' in part_name:
-        disk_name = part_name.rstrip('0123456789').rstrip('p')
-    else:
-        disk_name = part_name.rstrip('0123456789')
-
-    stat_path = f"/sys/block/{disk_name}/{part_name}/stat"
     try:
-        with open(stat_path, 'r') as f:
-            stats = f.read().split()
-            if len(stats) >= 7:
-                return int(stats[6])  # write_sectors
+        if _stat_fd < 0:
+            _stat_fd = os.open(_STAT_PATH, os.O_RDONLY)
+        stats = os.pread(_stat_fd, 256, 0).split(None, 7)
+        if len(stats) >= 7:
+            return int(stats[6])  # write_sectors
     except Exception as e:
         log.warning(f"Could not read disk stats: {e}")
 
     return -1
 
 
-def mount_usb_disk():
-    """Mount the USB disk locally. Returns True on success."""
-    disk_path   = cfg['virtual_disk_path']
-    mount_point = cfg['mount_point']
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                            use_errno=True)
+    return _libc
+
 
-    os.makedirs(mount_point, exist_ok=True)
-    subprocess.run(["umount", mount_point], capture_output=True)
+def _sys_mount(source, target, fstype):
+    """mount(2) via libc, without a fork/exec. Returns 0 or an errno value."""
+    try:
+        rc = _get_libc().mount(source.encode(), target.encode(), fstype.encode(),
+                               ctypes.c_ulong(0), None)
+    except (OSError, AttributeError):
+        return errno.ENOSYS
+    return 0 if rc == 0 else ctypes.get_errno()
+
+
+def _sys_umount(target):
+    """umount2(2) via libc. Returns 0 or an errno value (EINVAL = not mounted)."""
+    try:
+        rc = _get_libc().umount2(target.encode(), 0)
+    except (OSError, AttributeError):
+        return errno.ENOSYS
+    return 0 if rc == 0 else ctypes.get_errno()
 
-    if disk_path.startswith("/dev/"):
-        result = subprocess.run(["mount", disk_path, mount_point],
+
+def _syncfs(path):
+    """
+    syncfs(2) the filesystem holding *path*: flushes only that filesystem
+    rather than every mount on the Pi.  Falls back to os.sync().
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        os.sync()
+        return
+    try:
+        if _get_libc().syncfs(fd) != 0:
+            os.sync()
+    except (OSError, AttributeError):
+        os.sync()
+    finally:
+        os.close(fd)
+
+
+def mount_usb_disk():
+    """Mount the USB disk locally. Returns True on success."""
+    os.makedirs(MOUNT_POINT, exist_ok=True)
+    _sys_umount(MOUNT_POINT)   # clear any stale mount
+
+    if VIRTUAL_DISK_PATH.startswith("/dev/"):
+        err = _sys_mount(VIRTUAL_DISK_PATH, MOUNT_POINT, DISK_FSTYPE)
+        if err == 0:
+            return True
+        log.debug(f"mount(2) as {DISK_FSTYPE} failed ({os.strerror(err)}), "
+                  f"falling back to mount(8)")
+        result = subprocess.run(["mount", VIRTUAL_DISK_PATH, MOUNT_POINT],
                                 capture_output=True)
     else:
         subprocess.run(["modprobe", "loop"], check=False)
         result = subprocess.run(
-            ["mount", "-o", "loop", disk_path, mount_point],
+            ["mount", "-o", "loop", VIRTUAL_DISK_PATH, MOUNT_POINT],
             capture_output=True)
 
     if result.returncode != 0:
@@ -215,18 +373,18 @@ def mount_usb_disk():
 
 def unmount_usb_disk():
     """Unmount the USB disk."""
-    os.sync()
+    _syncfs(MOUNT_POINT)
     time.sleep(0.5)
-    subprocess.run(["umount", cfg['mount_point']], capture_output=True)
+    if _sys_umount(MOUNT_POINT) not in (0, errno.EINVAL):
+        subprocess.run(["umount", MOUNT_POINT], capture_output=True)
 
 
 def load_usb_gadget():
     """Load the USB mass storage gadget."""
-    disk_path = cfg['virtual_disk_path']
-    log.info(f"Loading USB gadget with {disk_path}...")
+    log.info(f"Loading USB gadget with {VIRTUAL_DISK_PATH}...")
     result = subprocess.run(
         ["modprobe", "g_mass_storage",
-         f"file={disk_path}", "stall=0", "removable=1"],
+         f"file={VIRTUAL_DISK_PATH}", "stall=0", "removable=1"],
         capture_output=True,
     )
     if result.returncode == 0:
@@ -238,14 +396,111 @@ def load_usb_gadget():
         return False
 
 
+def is_gadget_loaded():
+    """Return True if the g_mass_storage module is loaded (reads /proc/modules)."""
+    try:
+        with open('/proc/modules', 'rb') as f:
+            return (b'\n' + f.read()).find(b'\ng_mass_storage ') >= 0
+    except OSError:
+        return True   # can't tell — let modprobe decide
+
+
 def unload_usb_gadget():
     """Unload the USB mass storage gadget."""
-    subprocess.run(["modprobe", "-r", "g_mass_storage"], capture_output=True)
+    if is_gadget_loaded():
+        subprocess.run(["modprobe", "-r", "g_mass_storage"], capture_output=True)
     _ds['usb_active'] = False
 
 
+def _wait_gadget_released(timeout=1.0):
+    """Wait until /sys/module/g_mass_storage is gone (module fully removed),
+    polling briefly rather than sleeping a fixed second."""
+    deadline = time.monotonic() + timeout
+    while os.path.exists('/sys/module/g_mass_storage'):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
 # ── Harvest phase (main thread only) ─────────────────────────────────────────
 
+# Host-OS litter that is never harvested (dot-files are skipped separately).
+IGNORED_NAMES = frozenset({'desktop.ini', 'Thumbs.db', '.DS_Store'})
+
+
+def _iter_files(path):
+    """
+    Yield a DirEntry for every harvestable file under *path*, recursively.
+    Hidden files/dirs and IGNORED_NAMES are skipped.  os.scandir returns the
+    file type from the directory read itself, so no per-file stat is needed.
+    """
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            if name[0] == '.':
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif name not in IGNORED_NAMES:
+                yield entry
+
+
+def _fsync_dir(path):
+    """
+    Make unlinks/renames in *path* durable.  fsync on the directory fd
+    flushes just that directory's metadata; os.sync() would flush every
+    dirty page on the system.
+    """
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _copy_to_outbox():
+    """
+    Copy new files from the mounted disk into the outbox and wake the upload
+    worker.  Caller owns the mount (and the gadget being down).  Returns the
+    number of files copied.
+    """
+    copied = 0
+    copied_bytes = 0
+    skipped = 0
+    debug = log.isEnabledFor(logging.DEBUG)
+    for entry in _iter_files(MOUNT_POINT):
+        fname = entry.name
+        dest  = os.path.join(OUTBOX_DIR, fname)
+        if os.path.exists(dest):
+            if debug:
+                log.debug("Harvest: %s already pending, skipping", fname)
+            skipped += 1
+            continue
+        try:
+            shutil.copy2(entry.path, dest)
+            copied_bytes += entry.stat(follow_symlinks=False).st_size
+            if debug:
+                log.debug("Harvest: copied %s → outbox", fname)
+            copied += 1
+        except Exception as exc:
+            log.error("Harvest: failed to copy %s: %s", fname, exc)
+
+    _syncfs(OUTBOX_DIR)
+    log.info("Harvest complete: %d files (%d bytes) copied, %d already pending",
+             copied, copied_bytes, skipped)
+
+    # Update outbox total for the display
+    _invalidate_outbox_cache()
+    _ds['mb_remaining'] = _outbox_total_mb()
+
+    # Wake the upload worker immediately instead of waiting for the
+    # next upload_check_interval cycle.
+    if copied > 0:
+        _upload_trigger.set()
+    return copied
+
+
 def harvest_to_outbox():
     """
     Briefly take down the USB gadget, mount the disk, move new files to
@@ -254,71 +509,229 @@ def harvest_to_outbox():
 
     Safety: acquires _harvest_lock so no concurrent USB access occurs.
     """
-    outbox_dir  = cfg['outbox_dir']
-    mount_point = cfg['mount_point']
-
-    os.makedirs(outbox_dir, exist_ok=True)
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
 
     with _harvest_lock:
         log.info("Harvest: unloading USB gadget...")
         unload_usb_gadget()
         _ds['usb_active'] = False
-        time.sleep(1)
+        _wait_gadget_released()
 
         if not mount_usb_disk():
             log.error("Harvest: cannot mount disk — restoring gadget")
             load_usb_gadget()
             return
 
-        copied = 0
-        skipped = 0
-        for root, dirs, files in os.walk(mount_point):
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            for fname in files:
-                if fname.startswith('.') or fname in ('desktop.ini', 'Thumbs.db'):
-                    continue
-                src  = os.path.join(root, fname)
-                dest = os.path.join(outbox_dir, fname)
-                if os.path.exists(dest):
-                    log.debug(f"Harvest: {fname} already pending, skipping")
-                    skipped += 1
-                    continue
-                try:
-                    shutil.copy2(src, dest)
-                    log.info(f"Harvest: copied {fname} → outbox")
-                    copied += 1
-                except Exception as exc:
-                    log.error(f"Harvest: failed to copy {fname}: {exc}")
-
-        os.sync()
+        _copy_to_outbox()
         unmount_usb_disk()
-        log.info(f"Harvest complete: {copied} copied, {skipped} already pending")
-
-        # Update outbox total for the display
-        _ds['mb_remaining'] = _outbox_total_mb()
 
         load_usb_gadget()
         _ds['usb_active'] = True
 
-        # Wake the upload worker immediately instead of waiting for the
-        # next upload_check_interval cycle.
-        if copied > 0:
-            _upload_trigger.set()
-
 
 # ── Upload worker (background daemon thread) ──────────────────────────────────
 
+# Live upload progress for web_status: a fixed <Qd header (bytes_sent,
+# timestamp) rewritten in place with pwrite() per callback, followed by the
+# UTF-8 path of the file being uploaded.  Truncated to empty when idle.
+PROGRESS_PATH = "/tmp/airbridge_upload_progress.bin"
+PROGRESS_FMT  = struct.Struct('<Qd')
+_prog_fd      = -1
+
+
+def _progress_begin(filepath):
+    """Start a new progress record for *filepath*."""
+    global _prog_fd
+    try:
+        if _prog_fd < 0:
+            _prog_fd = os.open(PROGRESS_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(_prog_fd, 0)
+        os.pwrite(_prog_fd,
+                  PROGRESS_FMT.pack(0, time.time()) + filepath.encode(), 0)
+    except OSError as exc:
+        log.debug(f"Progress file unavailable: {exc}")
+
+
+def _progress_update(bytes_sent):
+    """Overwrite the fixed-size header only — constant time per callback."""
+    if _prog_fd >= 0:
+        try:
+            os.pwrite(_prog_fd, PROGRESS_FMT.pack(bytes_sent, time.time()), 0)
+        except OSError:
+            pass
+
+
+def _progress_end():
+    if _prog_fd >= 0:
+        try:
+            os.ftruncate(_prog_fd, 0)
+        except OSError:
+            pass
+
+
+# Outbox listing cached against the directory's (mtime_ns, size):
+# ((mtime_ns, size), paths, bytes).  Adding or removing a file bumps the mtime;
+# a file growing in place does not, so harvest_to_outbox() invalidates
+# explicitly after copying.  The upload worker and the harvest path both scan,
+# hence the lock.
+_outbox_cache = None
+_outbox_lock  = threading.Lock()
+# Timestamps are only as fine as the filesystem's tick (2 s on FAT), so a
+# change landing in the same tick as a scan keeps the same mtime.  A scan is
+# only cached once the directory's mtime is older than this.
+OUTBOX_MTIME_SLACK_NS = 2_000_000_000
+
+
+def _invalidate_outbox_cache():
+    global _outbox_cache
+    with _outbox_lock:
+        _outbox_cache = None
+
+
+def _scan_outbox():
+    """Return (sorted file paths, total bytes) for the outbox, rescanning only
+    when the directory has changed since the last call."""
+    global _outbox_cache
+    try:
+        st = os.stat(OUTBOX_DIR)
+    except OSError:
+        return [], 0
+    key = (st.st_mtime_ns, st.st_size)
+    with _outbox_lock:
+        cache = _outbox_cache
+        if cache is not None and cache[0] == key:
+            return cache[1], cache[2]
+        paths = []
+        total = 0
+        with os.scandir(OUTBOX_DIR) as it:
+            for entry in it:
+                if entry.is_file():
+                    paths.append(entry.path)
+                    total += entry.stat().st_size
+        paths.sort()
+        if time.time_ns() - st.st_mtime_ns > OUTBOX_MTIME_SLACK_NS:
+            _outbox_cache = (key, paths, total)
+        else:
+            _outbox_cache = None
+        return paths, total
+
+
 def _outbox_total_mb():
     """Return the total size of files in the outbox in MB."""
-    outbox_dir = cfg['outbox_dir']
-    if not os.path.isdir(outbox_dir):
-        return 0.0
-    total = sum(
-        os.path.getsize(os.path.join(outbox_dir, f))
-        for f in os.listdir(outbox_dir)
-        if os.path.isfile(os.path.join(outbox_dir, f))
-    )
-    return total / 1e6
+    return _scan_outbox()[1] / 1e6
+
+
+# Names of outbox files whose upload succeeded, one per line, appended before
+# each file is deleted.  The pi_usb_manager harvester reads it to tell an
+# archive that was delivered from one that was lost.  Capped by dropping the
+# oldest half; a dropped name only costs that harvester one full re-harvest.
+UPLOADED_MANIFEST     = os.path.join(os.path.dirname(OUTBOX_DIR), '.airbridge_uploaded')
+UPLOADED_MANIFEST_MAX = 64 * 1024
+
+
+def _record_uploaded(fname):
+    """Append *fname* to UPLOADED_MANIFEST."""
+    try:
+        with open(UPLOADED_MANIFEST, 'a') as f:
+            f.write(fname + '\n')
+            size = f.tell()
+        if size > UPLOADED_MANIFEST_MAX:
+            with open(UPLOADED_MANIFEST, 'r') as f:
+                lines = f.readlines()
+            tmp = UPLOADED_MANIFEST + '.tmp'
+            with open(tmp, 'w') as f:
+                f.writelines(lines[len(lines) // 2:])
+            os.replace(tmp, UPLOADED_MANIFEST)
+    except OSError as exc:
+        log.warning(f"Upload worker: cannot record {fname} as delivered: {exc}")
+
+
+def _upload_files(files):
+    """
+    Upload each outbox file in *files* over WiFi (FTP or HTTP per config),
+    deleting it from the outbox on success.  The single place any upload
+    path goes through, so batching and session reuse apply everywhere.
+    Returns (uploaded, failed).
+    """
+    import requests
+    from wifi_manager import upload_ftp, upload_http, FTPSession, HTTP_CHUNK_SIZE
+
+    uploaded = 0
+    failed   = 0
+    removed  = False
+
+    # One FTP login / one HTTP keep-alive connection for the whole batch
+    # (both connect lazily, so only the configured method opens anything).
+    with FTPSession(FTP_CFG['server'], FTP_CFG['port'],
+                    FTP_CFG['username'],
+                    FTP_CFG['password']) as ftp_session, \
+            requests.Session() as http_session:
+        for filepath in files:
+            if not os.path.exists(filepath):
+                continue
+            fname     = os.path.basename(filepath)
+            file_size = os.path.getsize(filepath)
+
+            if fname in _uploaded_this_session:
+                log.info(f"Upload worker: {fname} already uploaded, removing")
+                os.remove(filepath)
+                removed = True
+                _ds['mb_remaining'] = _outbox_total_mb()
+                continue
+
+            _pre_upload_mb = _ds['mb_uploaded']
+
+            def _on_progress(sent, total,
+                             _pre=_pre_upload_mb, _fsz=file_size):
+                _ds['mb_uploaded']  = _pre + sent / 1e6
+                _progress_update(sent)
+                _ds['mb_remaining'] = max(0.0, _outbox_total_mb() - sent / 1e6)
+
+            log.info(f"Upload worker: uploading {fname}...")
+            _progress_begin(filepath)
+            if UPLOAD_METHOD == 'http':
+                url = f"{HTTP_CFG['url_base']}/{fname}"
+                ok, msg = upload_http(
+                    url=url,
+                    filepath=filepath,
+                    chunk_size=HTTP_CFG.get('chunk_size', HTTP_CHUNK_SIZE),
+                    progress_callback=_on_progress,
+                    session=http_session,
+                )
+            else:
+                ok, msg = upload_ftp(
+                    server=FTP_CFG['server'],
+                    port=FTP_CFG['port'],
+                    username=FTP_CFG['username'],
+                    password=FTP_CFG['password'],
+                    filepath=filepath,
+                    remote_path=FTP_CFG['remote_path'],
+                    progress_callback=_on_progress,
+                    session=ftp_session,
+                )
+
+            _progress_end()
+
+            if ok:
+                log.info(f"Upload worker: {fname} uploaded OK")
+                uploaded += 1
+                _uploaded_this_session.add(fname)
+                _record_uploaded(fname)
+                os.remove(filepath)
+                removed = True
+                _ds['mb_uploaded']  = _pre_upload_mb + file_size / 1e6
+                _ds['mb_remaining'] = _outbox_total_mb()
+            else:
+                log.error(f"Upload worker: {fname} FAILED: {msg}")
+                failed += 1
+
+    # Persist the batch's deletions with one directory fsync.  A power cut
+    # before this point can only resurrect files that were already
+    # uploaded, so the worst case is a redundant re-upload.
+    if removed:
+        _fsync_dir(OUTBOX_DIR)
+
+    return uploaded, failed
 
 
 def upload_worker():
@@ -327,14 +740,12 @@ def upload_worker():
     Starts a captive portal if WiFi is unavailable and files are pending.
     Never touches the USB gadget or virtual disk.
     """
-    from wifi_manager import is_connected, upload_ftp, upload_http, add_network
+    from wifi_manager import is_connected, add_network
     from captive_portal import CaptivePortal
 
-    outbox_dir     = cfg['outbox_dir']
-    ftp_cfg        = cfg['ftp']
     check_interval = cfg.get('upload_check_interval', 300)
     portal         = CaptivePortal(
-        ssid=cfg.get('wifi_ap', {}).get('ssid', 'AirBridge'),
+        ssid=AP_SSID,
         channel=cfg.get('wifi_ap', {}).get('channel', 6),
     )
     portal_active   = False
@@ -348,12 +759,8 @@ def upload_worker():
 
     while True:
         try:
-            os.makedirs(outbox_dir, exist_ok=True)
-            pending = sorted(
-                os.path.join(outbox_dir, f)
-                for f in os.listdir(outbox_dir)
-                if os.path.isfile(os.path.join(outbox_dir, f))
-            )
+            os.makedirs(OUTBOX_DIR, exist_ok=True)
+            pending = _scan_outbox()[0]
 
             # ── WiFi / portal state machine ───────────────────────────────
             connected = is_connected()
@@ -386,7 +793,7 @@ def upload_worker():
                             portal_active = True
                             last_sta_retry = now
                             _ds['ap_mode'] = True
-                            _ds['carrier'] = cfg.get('wifi_ap', {}).get('ssid', 'AirBridge')
+                            _ds['carrier'] = AP_SSID
                         except Exception as exc:
                             log.error(f"Portal start failed: {exc}")
 
@@ -440,58 +847,8 @@ def upload_worker():
                 if not connected:
                     log.info("Upload worker: no WiFi, skipping upload this cycle")
                 else:
-                    for filepath in pending:
-                        if not os.path.exists(filepath):
-                            continue
-                        fname     = os.path.basename(filepath)
-                        file_size = os.path.getsize(filepath)
-
-                        if fname in _uploaded_this_session:
-                            log.info(f"Upload worker: {fname} already uploaded, removing")
-                            os.remove(filepath)
-                            os.sync()
-                            _ds['mb_remaining'] = _outbox_total_mb()
-                            continue
-
-                        _pre_upload_mb = _ds['mb_uploaded']
-
-                        def _on_progress(sent, total,
-                                         _pre=_pre_upload_mb, _fsz=file_size):
-                            _ds['mb_uploaded']  = _pre + sent / 1e6
-                            _ds['mb_remaining'] = max(0.0, _outbox_total_mb() - sent / 1e6)
-
-                        log.info(f"Upload worker: uploading {fname}...")
-                        upload_method = cfg.get('upload_method', 'ftp')
-                        if upload_method == 'http':
-                            http_cfg = cfg.get('http_upload', {})
-                            url = f"{http_cfg['url_base']}/{fname}"
-                            ok, msg = upload_http(
-                                url=url,
-                                filepath=filepath,
-                                chunk_size=http_cfg.get('chunk_size', 65536),
-                                progress_callback=_on_progress,
-                            )
-                        else:
-                            ok, msg = upload_ftp(
-                                server=ftp_cfg['server'],
-                                port=ftp_cfg['port'],
-                                username=ftp_cfg['username'],
-                                password=ftp_cfg['password'],
-                                filepath=filepath,
-                                remote_path=ftp_cfg['remote_path'],
-                                progress_callback=_on_progress,
-                            )
-
-                        if ok:
-                            log.info(f"Upload worker: {fname} uploaded OK")
-                            _uploaded_this_session.add(fname)
-                            os.remove(filepath)
-                            os.sync()
-                            _ds['mb_uploaded']  = _pre_upload_mb + file_size / 1e6
-                            _ds['mb_remaining'] = _outbox_total_mb()
-                        else:
-                            log.error(f"Upload worker: {fname} FAILED: {msg}")
-
+                    uploaded, failed = _upload_files(pending)
+                    log.info(f"Upload worker: batch done, {uploaded} uploaded, {failed} failed")
             else:
                 log.debug("Upload worker: outbox empty, sleeping")
 
@@ -512,9 +869,9 @@ def main():
     log.info("=" * 40)
     log.info("USB WiFi Airbridge Starting")
     log.info("=" * 40)
-    log.info(f"Virtual disk: {cfg['virtual_disk_path']}")
-    log.info(f"WiFi AP SSID: {cfg.get('wifi_ap', {}).get('ssid', 'AirBridge')}")
-    log.info(f"Quiet window: {cfg['quiet_window_seconds']}s")
+    log.info(f"Virtual disk: {VIRTUAL_DISK_PATH}")
+    log.info(f"WiFi AP SSID: {AP_SSID}")
+    log.info(f"Quiet window: {QUIET_WINDOW}s")
 
     # Initialise display (silent if hardware not present)
     display = AirbridgeDisplay()
@@ -526,28 +883,19 @@ def main():
     # Startup harvest: if the outbox is empty (e.g. after a reboot wiped the
     # ramdisk overlay) but the USB disk has files, re-harvest them now before
     # handing the drive back to the host.
-    outbox_dir = cfg['outbox_dir']
-    os.makedirs(outbox_dir, exist_ok=True)
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
     outbox_empty = not any(
-        os.path.isfile(os.path.join(outbox_dir, f))
-        for f in os.listdir(outbox_dir)
+        os.path.isfile(os.path.join(OUTBOX_DIR, f))
+        for f in os.listdir(OUTBOX_DIR)
     )
     if outbox_empty:
         log.info("Startup: outbox empty — checking USB disk for unuploaded files...")
+        # The gadget is already down, so harvest straight from this mount
+        # instead of probing, unmounting and cycling the gadget again.
         if mount_usb_disk():
-            mount_point = cfg['mount_point']
-            has_files = any(
-                not fname.startswith('.')
-                and fname not in ('desktop.ini', 'Thumbs.db')
-                for _, _, files in os.walk(mount_point)
-                for fname in files
-            )
+            if not _copy_to_outbox():
+                log.info("Startup: no new files on USB disk, no harvest needed")
             unmount_usb_disk()
-            if has_files:
-                log.info("Startup: files found on disk — running startup harvest")
-                harvest_to_outbox()
-            else:
-                log.info("Startup: USB disk is empty, no harvest needed")
         else:
             log.warning("Startup: could not mount disk to check for files")
 
@@ -555,6 +903,8 @@ def main():
     t = threading.Thread(target=upload_worker, name="upload-worker", daemon=True)
     t.start()
     log.info("Upload worker thread started")
+    threading.Thread(target=wifi_status_worker, name="wifi-status",
+                     daemon=True).start()
 
     if not load_usb_gadget():
         log.error("Failed to load USB gadget. Exiting.")
@@ -565,7 +915,8 @@ def main():
     last_seen_sectors  = baseline_sectors
     last_write_time    = None
     host_was_connected = False
-    _wifi_tick         = 0   # poll WiFi status every 30 cycles (30 s)
+    _next_write_log    = 0.0
+    _unlogged_bytes    = 0
 
     # State for responsive drive-size display.
     _last_fat_mb      = -1.0  # last FAT-confirmed used_mb; -1 = never read
@@ -573,19 +924,13 @@ def main():
     _fat_at_connect_mb = -1.0
 
     log.info("Monitoring for file writes...")
-    log.info(f"(Will harvest {cfg['quiet_window_seconds']}s after last write activity)")
+    log.info(f"(Will harvest {QUIET_WINDOW}s after last write activity)")
 
     while True:
         try:
             udc_state       = get_udc_state()
             current_sectors = get_disk_write_sectors()
 
-            # ── WiFi status poll (every 30 s) ──────────────────────────────────
-            _wifi_tick += 1
-            if _wifi_tick >= 30:
-                _wifi_tick = 0
-                _poll_wifi_status()
-
             # ── Live drive size ────────────────────────────────────────────────
             # Host OS flushes FAT32 FSInfo lazily (~30-60 s dirty writeback).
             # Anchor the sector baseline ONLY when FAT reports a new value so the
@@ -617,16 +962,20 @@ def main():
                     _fat_at_connect_mb = fat_used
 
                 if current_sectors > last_seen_sectors:
-                    bytes_written = (current_sectors - last_seen_sectors) * 512
-                    total_written = (current_sectors - baseline_sectors) * 512
-                    log.info(f"Write activity: +{bytes_written} bytes "
-                             f"(session total: {total_written} bytes)")
+                    _unlogged_bytes += (current_sectors - last_seen_sectors) * 512
+                    now = time.monotonic()
+                    if now >= _next_write_log:
+                        _next_write_log = now + WRITE_LOG_INTERVAL
+                        log.info("Write activity: +%d bytes (session total: %d bytes)",
+                                 _unlogged_bytes,
+                                 (current_sectors - baseline_sectors) * 512)
+                        _unlogged_bytes = 0
                     last_seen_sectors = current_sectors
                     last_write_time   = time.time()
 
                 if last_write_time is not None:
                     quiet_elapsed = time.time() - last_write_time
-                    if quiet_elapsed >= cfg['quiet_window_seconds']:
+                    if quiet_elapsed >= QUIET_WINDOW:
                         fat_now, _ = get_fat32_disk_info()
                         data_written = (
                             fat_now > _fat_at_connect_mb + 0.05
@@ -635,8 +984,8 @@ def main():
                         )
                         total_written = (current_sectors - baseline_sectors) * 512
                         if data_written:
-                            log.info(f"Quiet window elapsed "
-                                     f"({total_written} bytes written). Harvesting...")
+                            log.info("Quiet window elapsed (%d bytes written). "
+                                     "Harvesting...", total_written)
                             harvest_to_outbox()
                         else:
                             log.info("Quiet window elapsed but no new file data "
@@ -646,26 +995,33 @@ def main():
                         last_write_time    = None
                         host_was_connected = False
                         _fat_at_connect_mb = -1.0
+                        _unlogged_bytes    = 0
 
             else:
                 if host_was_connected and last_write_time is not None:
                     total_written = (last_seen_sectors - baseline_sectors) * 512
-                    log.info(f"Host disconnected; harvesting {total_written} bytes...")
+                    log.info("Host disconnected; harvesting %d bytes...", total_written)
                     harvest_to_outbox()
                 host_was_connected = False
                 last_write_time    = None
                 _fat_at_connect_mb = -1.0
+                _unlogged_bytes    = 0
 
             _ds['usb_active'] = (udc_state == "configured")
             _refresh_display()
-            time.sleep(1)
+
+            # Sleep in the kernel until the UDC state changes.  While the host
+            # is configured, wake every second to sample write sectors for the
+            # quiet window; otherwise only the display refresh needs a tick.
+            wait_udc_event(ACTIVE_WAIT_S if udc_state == "configured"
+                           else IDLE_WAIT_S)
 
         except KeyboardInterrupt:
             log.info("Shutting down...")
             display.show_message("Shutdown", "", "")
             break
         except Exception as e:
-            log.error(f"Error in main loop: {e}")
+            log.error("Error in main loop: %s", e)
             time.sleep(10)
 
     return 0
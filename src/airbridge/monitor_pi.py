@@ -3,23 +3,24 @@
 Monitor for Raspberry Pi Zero connection and provide power control options.
 """
 
+import glob
+import shutil
 import subprocess
 import time
 import re
 import sys
-from pathlib import Path
 
-def run_command(cmd):
-    """Run a shell command and return the output."""
+def run_command(argv):
+    """Run a command (argv list, no shell) and return the output."""
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        result = subprocess.run(argv, capture_output=True, text=True)
         return result.stdout, result.stderr, result.returncode
     except Exception as e:
         return "", str(e), 1
 
 def get_usb_devices():
     """Get current USB devices with their bus and device numbers."""
-    stdout, stderr, code = run_command("lsusb")
+    stdout, stderr, code = run_command(["lsusb"])
     devices = []
     for line in stdout.strip().split('\n'):
         if line:
@@ -38,7 +39,7 @@ def get_usb_devices():
 
 def get_block_devices():
     """Get current block devices."""
-    stdout, stderr, code = run_command("lsblk -o NAME,SIZE,TYPE,MOUNTPOINT")
+    stdout, stderr, code = run_command(["lsblk", "-o", "NAME,SIZE,TYPE,MOUNTPOINT"])
     return stdout
 
 def find_pi_zero():
@@ -57,20 +58,11 @@ def find_pi_zero():
 def get_usb_port_path(bus, device):
     """Get the physical port path for a USB device."""
     # Look in sysfs for the device path
-    sysfs_pattern = f"/sys/bus/usb/devices/{bus}-*"
-    stdout, stderr, code = run_command(f"ls -d {sysfs_pattern} 2>/dev/null || true")
-    
-    paths = []
-    for line in stdout.strip().split('\n'):
-        if line and f"{bus}-" in line:
-            paths.append(line)
-    
-    return paths
+    return sorted(glob.glob(f"/sys/bus/usb/devices/{bus}-*"))
 
 def check_uhubctl_available():
     """Check if uhubctl is available for port power control."""
-    stdout, stderr, code = run_command("which uhubctl")
-    return code == 0
+    return shutil.which("uhubctl") is not None
 
 def show_port_control_options(bus, device):
     """Show available port control options."""
@@ -4,13 +4,20 @@ Raspberry Pi USB Gadget Manager
 Handles the duty cycle of USB gadget mode and file harvesting.
 """
 
+import contextlib
+import ctypes
+import io
+import json
 import os
 import time
 import subprocess
 import logging
+import queue
+import select
 import shutil
+import tarfile
+import threading
 import zipfile
-from pathlib import Path
 
 # Configure logging
 logging.basicConfig(
@@ -28,11 +35,210 @@ USB_IMAGE_PATH = "/dev/mmcblk0p3"  # Use DATA partition
 MOUNT_POINT = "/mnt/usb_logs"
 OUTBOX_DIR = "/home/cedric/outbox"
 QUIET_WINDOW_SECONDS = 30
+# (mtime, size) of every file as of the last successful harvest, keyed by
+# arcname, so each cycle only archives what the host added or changed.  Saved
+# with the names of the outbox archives holding those files that haven't been
+# confirmed delivered yet: if one leaves the outbox without being delivered
+# (deleted, outbox wiped, SD corruption) the next harvest starts over from
+# the full image.
+HARVEST_STATE_PATH = "/home/cedric/.airbridge_last_harvest"
+# Names of outbox files the upload worker (main.py) delivered, one per line.
+UPLOADED_MANIFEST_PATH = "/home/cedric/.airbridge_uploaded"
+# Deflate level for harvest archives.  Log text compresses nearly as well at
+# level 1 as at the default 6, at a fraction of the CPU time on a Pi.
+ARCHIVE_COMPRESSLEVEL = 1
+# Read/write chunk for streaming files into the archive and buffering it out.
+ARCHIVE_BUFSIZE = 1 << 20
+# Files up to this size are read ahead whole on a background thread while the
+# previous one is deflated; larger files are streamed in place.
+PREFETCH_MAX_BYTES = 4 << 20
+PREFETCH_DEPTH = 4
+# Already-compressed payloads: stored as-is, deflating them again gains nothing.
+INCOMPRESSIBLE_EXTS = frozenset({
+    '.gz', '.zst', '.xz', '.bz2', '.zip', '.7z',
+    '.jpg', '.jpeg', '.png', '.mp4', '.mp3',
+})
+# Leading bytes of the same formats, to catch files whose name doesn't give
+# them away (e.g. a rotated log gzipped in place as syslog.1).
+INCOMPRESSIBLE_MAGIC = (
+    b'\x1f\x8b',            # gzip
+    b'PK\x03\x04',          # zip
+    b'\xfd7zXZ\x00',        # xz
+    b'BZh',                 # bzip2
+    b'(\xb5/\xfd',          # zstd
+    b"7z\xbc\xaf'\x1c",     # 7z
+    b'\x89PNG',             # png
+    b'\xff\xd8\xff',         # jpeg
+)
+# 'zip' (per-file deflate, stdlib only) or 'tar.zst' (one zstd stream over a
+# tar; smaller for log corpora, needs the optional zstandard package).
+ARCHIVE_FORMAT = 'zip'
+ZSTD_LEVEL = 3
+
+def _iter_files(root):
+    """
+    Yield (path, arcname, stat) for every file under root using os.scandir.
+    DirEntry carries the file type from the directory read, and arcnames are
+    built per directory instead of calling os.path.relpath per file.
+    """
+    stack = [(root, '')]
+    while stack:
+        path, rel = stack.pop()
+        with os.scandir(path) as it:
+            for entry in it:
+                arcname = rel + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, arcname + '/'))
+                else:
+                    yield entry.path, arcname, entry.stat(follow_symlinks=False)
+
+def _load_harvest_state():
+    """Return (files, archives); both empty if there is no usable state."""
+    try:
+        with open(HARVEST_STATE_PATH, 'r') as f:
+            state = json.load(f)
+        return state['files'], state['archives']
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}, []
+
+def _save_harvest_state(files, archives):
+    """Write the state atomically so a crash can't leave it half-written."""
+    tmp = HARVEST_STATE_PATH + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'files': files, 'archives': archives}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, HARVEST_STATE_PATH)
+
+_libc = None
+
+def _syncfs(path):
+    """
+    syncfs(2) the filesystem holding *path*: flushes only that filesystem
+    rather than every mount on the Pi.  Falls back to os.sync().
+    """
+    global _libc
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        os.sync()
+        return
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(None, use_errno=True)
+        if _libc.syncfs(fd) != 0:
+            os.sync()
+    except (OSError, AttributeError):
+        os.sync()
+    finally:
+        os.close(fd)
+
+def _load_uploaded():
+    """Names recorded in UPLOADED_MANIFEST_PATH (empty if there is none)."""
+    try:
+        with open(UPLOADED_MANIFEST_PATH, 'r') as f:
+            return set(f.read().splitlines())
+    except OSError:
+        return set()
+
+@contextlib.contextmanager
+def _open_sequential(path):
+    """
+    Open path for one sequential pass: advise the kernel to read ahead
+    aggressively, and to drop the pages once we're done so a harvest doesn't
+    evict the service's working set from the Pi's small page cache.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        with os.fdopen(fd, 'rb', closefd=False) as f:
+            yield f
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+def _read_ahead(items):
+    """
+    Yield (path, arcname, zinfo, data) for each (path, arcname) in items.
+    A reader thread stats each file and, for files up to PREFETCH_MAX_BYTES,
+    reads the contents, staying up to PREFETCH_DEPTH files ahead so SD-card
+    reads overlap with compression.  data is None for large or unreadable
+    files, which the caller streams itself; zinfo is None if the stat failed.
+    """
+    q = queue.Queue(maxsize=PREFETCH_DEPTH)
+    stop = threading.Event()
+    done = object()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _reader():
+        try:
+            for path, arcname in items:
+                data = None
+                try:
+                    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+                except OSError:
+                    zinfo = None
+                if zinfo is not None and zinfo.file_size <= PREFETCH_MAX_BYTES:
+                    try:
+                        with _open_sequential(path) as src:
+                            data = src.read()
+                    except OSError:
+                        pass
+                if not _put((path, arcname, zinfo, data)):
+                    return
+        except Exception as e:
+            _put(e)
+        finally:
+            _put(done)
+
+    t = threading.Thread(target=_reader, daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        t.join()
+
+def _is_incompressible(arcname, head):
+    """True if arcname's extension or its first bytes mark it as compressed."""
+    return (os.path.splitext(arcname)[1].lower() in INCOMPRESSIBLE_EXTS
+            or head.startswith(INCOMPRESSIBLE_MAGIC))
+
+def _set_compression(zinfo, incompressible):
+    if incompressible:
+        zinfo.compress_type = zipfile.ZIP_STORED
+        return
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    # A ZipInfo we built doesn't inherit the ZipFile's compresslevel.  The
+    # per-entry level is public as compress_level from Python 3.13; older
+    # versions only have _compresslevel.
+    if hasattr(zinfo, 'compress_level'):
+        zinfo.compress_level = ARCHIVE_COMPRESSLEVEL
+    else:
+        zinfo._compresslevel = ARCHIVE_COMPRESSLEVEL
 
 class USBGadgetManager:
     def __init__(self):
         self.gadget_loaded = False
         self.last_mtime = 0
+        self.harvested, self.harvest_archives = _load_harvest_state()
+        # UDC state attribute, discovered and opened once (the UDC name never
+        # changes at runtime); retried lazily if dwc2 isn't bound yet.
+        self._udc_fd, self._udc_poll = self._open_udc_state()
         
         # Ensure directories exist
         os.makedirs(MOUNT_POINT, exist_ok=True)
@@ -77,15 +283,13 @@ class USBGadgetManager:
     
     def get_udc_state(self):
         """Get the UDC state to check if host is connected."""
-        try:
-            udc_dirs = list(Path('/sys/class/udc').glob('*'))
-            if not udc_dirs:
+        if self._udc_fd < 0:
+            self._udc_fd, self._udc_poll = self._open_udc_state()
+            if self._udc_fd < 0:
                 return None
-            
-            state_file = udc_dirs[0] / 'state'
-            if state_file.exists():
-                return state_file.read_text().strip()
-            return None
+        try:
+            # pread at offset 0 re-reads the attribute and re-arms POLLPRI.
+            return os.pread(self._udc_fd, 64, 0).decode().strip()
         except Exception as e:
             logger.error(f"Error reading UDC state: {e}")
             return None
@@ -98,6 +302,20 @@ class USBGadgetManager:
             logger.error(f"Error getting image mtime: {e}")
             return 0
     
+    def _open_udc_state(self):
+        """Open the UDC state attribute for poll(); returns (fd, poller) or (-1, None)."""
+        try:
+            udc_dirs = os.listdir('/sys/class/udc')
+            if not udc_dirs:
+                return -1, None
+            fd = os.open(f'/sys/class/udc/{udc_dirs[0]}/state', os.O_RDONLY)
+        except OSError:
+            return -1, None
+        poller = select.poll()
+        # sysfs_notify() on a gadget state change wakes POLLPRI waiters.
+        poller.register(fd, select.POLLPRI | select.POLLERR)
+        return fd, poller
+    
     def wait_for_quiet_window(self):
         """Wait for the quiet window (no writes for specified duration)."""
         logger.info(f"Waiting for {QUIET_WINDOW_SECONDS}s quiet window...")
@@ -127,17 +345,26 @@ class USBGadgetManager:
                 logger.info(f"UDC state changed to '{state}', host disconnected")
                 return True
             
-            time.sleep(2)
+            # Image mtime has no change notification for gadget writes, so it
+            # is still sampled every 2 s; a UDC state change wakes us at once.
+            timeout = min(2.0, QUIET_WINDOW_SECONDS - quiet_duration)
+            if self._udc_poll is not None:
+                self._udc_poll.poll(timeout * 1000)
+            else:
+                time.sleep(timeout)
     
     def mount_image(self):
-        """Mount the USB image locally."""
+        """Mount the USB image locally (read-only: harvest never writes to it)."""
         try:
             # Ensure mount point exists and is empty
             if os.path.ismount(MOUNT_POINT):
                 subprocess.run(['sudo', 'umount', MOUNT_POINT], check=False)
             
+            # A partition is mounted directly; only a regular image file
+            # needs a loop device in front of it.
+            opts = 'ro' if USB_IMAGE_PATH.startswith('/dev/') else 'ro,loop'
             result = subprocess.run([
-                'sudo', 'mount', '-o', 'loop', USB_IMAGE_PATH, MOUNT_POINT
+                'sudo', 'mount', '-o', opts, USB_IMAGE_PATH, MOUNT_POINT
             ], capture_output=True, text=True)
             
             if result.returncode == 0:
@@ -165,6 +392,23 @@ class USBGadgetManager:
             logger.error(f"Error unmounting image: {e}")
             return False
     
+    def drop_image_cache(self):
+        """
+        Evict USB_IMAGE_PATH's pages from the page cache.  The device is
+        root-only, so like every other device operation this goes through
+        sudo: GNU dd with iflag=nocache and count=0 reads nothing and just
+        advises DONTNEED over the whole device.
+        """
+        try:
+            result = subprocess.run([
+                'sudo', 'dd', f'if={USB_IMAGE_PATH}',
+                'iflag=nocache', 'count=0', 'status=none'
+            ], capture_output=True, text=True)
+            if result.returncode != 0:
+                logger.warning(f"Failed to drop image page cache: {result.stderr.strip()}")
+        except Exception as e:
+            logger.warning(f"Error dropping image page cache: {e}")
+    
     def harvest_files(self):
         """Harvest new files from the mounted image."""
         try:
@@ -172,38 +416,113 @@ class USBGadgetManager:
                 logger.error("Mount point is not mounted")
                 return False
             
+            fmt, zstd = ARCHIVE_FORMAT, None
+            if fmt == 'tar.zst':
+                try:
+                    import zstandard as zstd
+                except ImportError:
+                    logger.warning("zstandard not installed, archiving as zip")
+                    fmt = 'zip'
+            
             # Create timestamped archive
             timestamp = int(time.time())
-            archive_name = f"harvest_{timestamp}.zip"
+            archive_name = f"harvest_{timestamp}.{fmt}"
             archive_path = os.path.join(OUTBOX_DIR, archive_name)
             
-            files_found = False
+            # The saved state holds while every archive it was built from is
+            # either still in the outbox or recorded as delivered.
+            if self.harvest_archives:
+                delivered = _load_uploaded()
+                lost = [a for a in self.harvest_archives if a not in delivered
+                        and not os.path.exists(os.path.join(OUTBOX_DIR, a))]
+                if lost:
+                    logger.info(f"{lost[0]} left the outbox undelivered, harvesting all files")
+                    self.harvested, self.harvest_archives = {}, []
+                else:
+                    self.harvest_archives = [a for a in self.harvest_archives
+                                             if a not in delivered]
             
-            with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(MOUNT_POINT):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, MOUNT_POINT)
-                        zipf.write(file_path, arcname)
-                        files_found = True
-                        logger.info(f"Added to archive: {arcname}")
+            # Only files that are new or whose (mtime, size) changed since the
+            # last harvest; files the host deleted drop out of the state.
+            seen = {}
+            changed = []
+            for file_path, arcname, st in _iter_files(MOUNT_POINT):
+                sig = [st.st_mtime, st.st_size]
+                seen[arcname] = sig
+                if self.harvested.get(arcname) != sig:
+                    changed.append((file_path, arcname))
+            
+            if fmt == 'tar.zst':
+                files_found = self._write_tar_zst(archive_path, changed, zstd)
+            else:
+                files_found = self._write_zip(archive_path, changed)
+            
+            # Drop the mount's cached metadata blocks as well
+            self.drop_image_cache()
             
             if files_found:
                 logger.info(f"Created archive: {archive_path}")
+                self.harvest_archives.append(archive_name)
                 
-                # Sync to ensure data is written
-                os.sync()
-                return True
+                # Sync to ensure data is written (just the outbox's filesystem)
+                _syncfs(OUTBOX_DIR)
             else:
                 # Remove empty archive
                 os.remove(archive_path)
-                logger.info("No files found to harvest")
-                return True
+                logger.info("No new or modified files to harvest")
+            
+            # Advance the state only once the archive is safely on disk, so
+            # a failed cycle is retried in full next time.
+            self.harvested = seen
+            _save_harvest_state(self.harvested, self.harvest_archives)
+            return True
                 
         except Exception as e:
             logger.error(f"Error harvesting files: {e}")
             return False
     
+    def _write_zip(self, archive_path, changed):
+        """Write changed files to a zip; returns True if any were added."""
+        files_found = False
+        with open(archive_path, 'wb', buffering=0) as raw, \
+                io.BufferedWriter(raw, buffer_size=ARCHIVE_BUFSIZE) as out, \
+                zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED,
+                                allowZip64=True,
+                                compresslevel=ARCHIVE_COMPRESSLEVEL) as zipf:
+            for file_path, arcname, zinfo, data in _read_ahead(changed):
+                if zinfo is None:
+                    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                if data is not None:
+                    _set_compression(zinfo, _is_incompressible(arcname, data[:8]))
+                    zipf.writestr(zinfo, data)
+                else:
+                    with _open_sequential(file_path) as src:
+                        # peek() fills the buffer without consuming it.
+                        _set_compression(zinfo, _is_incompressible(arcname, src.peek(8)[:8]))
+                        with zipf.open(zinfo, 'w', force_zip64=True) as dst:
+                            shutil.copyfileobj(src, dst, ARCHIVE_BUFSIZE)
+                files_found = True
+                logger.info(f"Added to archive: {arcname}")
+        return files_found
+    
+    def _write_tar_zst(self, archive_path, changed, zstd):
+        """Write changed files as one zstd-compressed tar stream."""
+        files_found = False
+        cctx = zstd.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+        with open(archive_path, 'wb') as out, \
+                cctx.stream_writer(out) as zout, \
+                tarfile.open(fileobj=zout, mode='w|') as tf:
+            for file_path, arcname, _, data in _read_ahead(changed):
+                tinfo = tf.gettarinfo(file_path, arcname)
+                if data is not None:
+                    tf.addfile(tinfo, io.BytesIO(data))
+                else:
+                    with _open_sequential(file_path) as src:
+                        tf.addfile(tinfo, src)
+                files_found = True
+                logger.info(f"Added to archive: {arcname}")
+        return files_found
+    
     def run_duty_cycle(self):
         """Run one complete duty cycle."""
         logger.info("Starting duty cycle...")
@@ -245,6 +564,10 @@ class USBGadgetManager:
         
         if os.path.ismount(MOUNT_POINT):
             self.unmount_image()
+        
+        if self._udc_fd >= 0:
+            os.close(self._udc_fd)
+            self._udc_fd, self._udc_poll = -1, None
 
 def main():
     """Main loop."""
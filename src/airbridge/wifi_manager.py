@@ -7,10 +7,22 @@ Uses NetworkManager (nmcli) and /proc/net/wireless — no iwconfig needed.
 import socket
 import subprocess
 import ftplib
+import contextlib
+import functools
 import os
+import queue
+import threading
 import time
 import requests
 
+# Bytes handed to the socket per write.  Larger blocks mean fewer sendall()
+# calls and progress callbacks per file; the kernel splits them into
+# segments anyway.
+FTP_BLOCKSIZE   = 256 * 1024
+# Default HTTP POST size when the config doesn't set one: each chunk costs a
+# full request/response round trip, so bigger chunks amortize the latency.
+HTTP_CHUNK_SIZE = 256 * 1024
+
 
 def _run(cmd):
     return subprocess.run(cmd, capture_output=True, text=True)
@@ -80,72 +92,217 @@ def add_network(ssid: str, password: str) -> None:
     _run(cmd)
 
 
+class FTPSession:
+    """
+    A logged-in FTP control connection shared by several uploads, so a batch
+    pays for connect + USER/PASS + TYPE once instead of once per file.
+    Connects lazily; drop() discards a broken connection so the next get()
+    reconnects.
+    """
+
+    def __init__(self, server, port, username, password, timeout=30):
+        self.server   = server
+        self.port     = port
+        self.username = username
+        self.password = password
+        self.timeout  = timeout
+        self._ftp     = None
+
+    def get(self):
+        """Return the live connection, connecting and logging in if needed."""
+        if self._ftp is None:
+            ftp = ftplib.FTP(timeout=self.timeout)
+            ftp.connect(self.server, self.port)
+            ftp.login(self.username, self.password)
+            ftp.set_pasv(True)
+            ftp.sendcmd("TYPE I")
+            self._ftp = ftp
+        return self._ftp
+
+    def drop(self):
+        """Discard the connection without a QUIT (used after errors)."""
+        if self._ftp is not None:
+            try:
+                self._ftp.close()
+            except OSError:
+                pass
+            self._ftp = None
+
+    def close(self):
+        """Politely QUIT and close the connection, if open."""
+        if self._ftp is not None:
+            try:
+                self._ftp.quit()
+            except (ftplib.Error, OSError):
+                pass
+            self.drop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def upload_ftp(server, port, username, password, filepath,
                remote_path="/", max_retries=3, retry_delay=5,
-               progress_callback=None):
+               progress_callback=None, session=None):
     """
     Upload a file via FTP using ftplib over wlan0.
+    Pass an FTPSession as *session* to reuse one login across many files;
+    otherwise a private connection is opened and closed.
     Returns (success: bool, message: str).
     """
     if not os.path.exists(filepath):
         return False, f"File not found: {filepath}"
 
-    filesize = os.path.getsize(filepath)
-    filename = os.path.basename(filepath)
-    remote   = remote_path.rstrip("/") + "/" + filename
+    if session is None:
+        with FTPSession(server, port, username, password) as own:
+            return upload_ftp(server, port, username, password, filepath,
+                              remote_path, max_retries, retry_delay,
+                              progress_callback, session=own)
+
+    with open(filepath, "rb") as fileobj:
+        return upload_ftp_stream(session, fileobj, os.path.basename(filepath),
+                                 os.path.getsize(filepath), remote_path,
+                                 max_retries, retry_delay, progress_callback,
+                                 use_sendfile=True)
+
+
+def _store_sendfile(ftp, cmd, fileobj, rest, callback):
+    """
+    STOR *fileobj* from its current position with socket.sendfile(), which
+    uses os.sendfile() so the bytes go page cache → socket without passing
+    through Python.  Sent in FTP_BLOCKSIZE slices to keep progress updates.
+    """
+    with ftp.transfercmd(cmd, rest) as conn:
+        while True:
+            sent = conn.sendfile(fileobj, fileobj.tell(), FTP_BLOCKSIZE)
+            if not sent:
+                break
+            callback(sent)
+    return ftp.voidresp()
+
 
-    print(f"WiFi FTP upload: {filename} ({filesize} bytes) → {server}")
+def upload_ftp_stream(session, fileobj, filename, filesize=None,
+                      remote_path="/", max_retries=3, retry_delay=5,
+                      progress_callback=None, use_sendfile=False):
+    """
+    Upload an open binary file object as *filename* through an FTPSession.
+    Lets a caller ship an archive built in memory (e.g. a
+    SpooledTemporaryFile) without writing it to the SD card first.
+    Resume and retries need a seekable *fileobj*; a pipe gets one attempt.
+    Set *use_sendfile* only for a real on-disk file: the transfer is then
+    zero-copy (socket.sendfile falls back to read/send where unsupported).
+    Returns (success: bool, message: str).
+    """
+    seekable = fileobj.seekable()
+    start    = fileobj.tell() if seekable else 0
+    if filesize is None and seekable:
+        filesize = fileobj.seek(0, os.SEEK_END) - start
+    remote = remote_path.rstrip("/") + "/" + filename
+    if not seekable:
+        max_retries = 1
+
+    print(f"WiFi FTP upload: {filename} ({filesize} bytes) → {session.server}")
 
     for attempt in range(max_retries):
         try:
-            ftp = ftplib.FTP(timeout=30)
-            ftp.connect(server, port)
-            ftp.login(username, password)
-            ftp.set_pasv(True)
-            ftp.sendcmd("TYPE I")
+            ftp = session.get()
 
             offset = 0
-            try:
-                server_size = ftp.size(remote) or 0
-                if server_size > 0 and server_size < filesize:
-                    offset = server_size
-                    print(f"  Resuming from byte {offset}")
-                elif server_size >= filesize:
-                    ftp.quit()
-                    return True, "Already complete"
-            except ftplib.error_perm:
-                offset = 0
+            if seekable and filesize is not None:
+                try:
+                    server_size = ftp.size(remote) or 0
+                    if server_size > 0 and server_size < filesize:
+                        offset = server_size
+                        print(f"  Resuming from byte {offset}")
+                    elif server_size >= filesize:
+                        return True, "Already complete"
+                except ftplib.error_perm:
+                    offset = 0
 
             bytes_sent = [offset]
 
-            def _progress(data):
-                bytes_sent[0] += len(data)
+            def _progress(n):
+                bytes_sent[0] += n
                 if progress_callback:
                     progress_callback(bytes_sent[0], filesize)
 
-            with open(filepath, "rb") as f:
-                if offset > 0:
-                    f.seek(offset)
-                    ftp.sendcmd(f"REST {offset}")
-                ftp.storbinary(f"STOR {remote}", f,
-                               blocksize=65536, callback=_progress)
+            if seekable:
+                fileobj.seek(start + offset)
+            rest = offset if offset > 0 else None
+            if use_sendfile:
+                _store_sendfile(ftp, f"STOR {remote}", fileobj, rest, _progress)
+            else:
+                ftp.storbinary(f"STOR {remote}", fileobj, blocksize=FTP_BLOCKSIZE,
+                               callback=lambda data: _progress(len(data)), rest=rest)
 
-            ftp.quit()
             print(f"Upload complete: {filename}")
             return True, "Upload successful"
 
         except (ftplib.Error, OSError, TimeoutError) as exc:
             print(f"FTP attempt {attempt+1}/{max_retries} failed: {exc}")
+            session.drop()
             if attempt < max_retries - 1:
                 time.sleep(retry_delay)
 
     return False, f"Upload failed after {max_retries} attempts"
 
 
-def upload_http(url, filepath, chunk_size=65536,
-                progress_callback=None, max_retries=3):
+def _prefetch_chunks(f, chunk_size, depth=2):
+    """
+    Yield f.read(chunk_size) until EOF, read by a background thread that
+    stays up to *depth* chunks ahead, so SD-card reads overlap with the
+    network send of the previous chunk.  A read error is re-raised here in
+    the consumer.  Closing the generator stops and joins the reader (do so
+    before closing *f*).
+    """
+    q    = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _reader():
+        # Always end with an exception or the sentinel: a reader that died
+        # silently would leave the consumer blocked in q.get() forever.
+        try:
+            for chunk in iter(functools.partial(f.read, chunk_size), b""):
+                if not _put(chunk):
+                    return
+        except Exception as e:
+            _put(e)
+        _put(done)
+
+    t = threading.Thread(target=_reader, daemon=True)
+    t.start()
+    try:
+        while True:
+            chunk = q.get()
+            if chunk is done:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        stop.set()
+        t.join()
+
+
+def upload_http(url, filepath, chunk_size=HTTP_CHUNK_SIZE,
+                progress_callback=None, max_retries=3, session=None):
     """
     Upload a file via chunked HTTP POST over wlan0.
+    Pass a requests.Session as *session* to keep one keep-alive connection
+    across chunks and files instead of reconnecting for every POST.
     Returns (success: bool, message: str).
     """
     if not os.path.exists(filepath):
@@ -156,37 +313,42 @@ def upload_http(url, filepath, chunk_size=65536,
 
     print(f"WiFi HTTP upload: {filename} ({filesize} bytes) → {url}")
 
-    with open(filepath, "rb") as f:
-        offset = 0
-        while offset < filesize:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            chunk_len = len(chunk)
+    post = session.post if session is not None else requests.post
 
-            sent = False
-            for attempt in range(max_retries):
-                chunk_url = f"{url}?offset={offset}&total={filesize}"
-                try:
-                    resp = requests.post(
-                        chunk_url, data=chunk,
-                        headers={"Content-Type": "application/octet-stream"},
-                        timeout=120,
-                    )
-                    if resp.status_code in (200, 201, 204):
-                        sent = True
-                        break
-                    print(f"  HTTP {resp.status_code} (attempt {attempt+1})")
-                except requests.RequestException as exc:
-                    print(f"  HTTP error (attempt {attempt+1}): {exc}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-
-            if not sent:
-                return False, f"HTTP chunk failed at offset {offset}"
-
-            offset += chunk_len
-            if progress_callback:
-                progress_callback(offset, filesize)
+    offset = 0
+    try:
+        with open(filepath, "rb", buffering=0) as f, \
+                contextlib.closing(_prefetch_chunks(f, chunk_size)) as chunks:
+            # Reads run ahead on a background thread while this one POSTs.
+            for chunk in chunks:
+                chunk_len = len(chunk)
+
+                sent = False
+                for attempt in range(max_retries):
+                    chunk_url = f"{url}?offset={offset}&total={filesize}"
+                    try:
+                        resp = post(
+                            chunk_url, data=chunk,
+                            headers={"Content-Type": "application/octet-stream"},
+                            timeout=120,
+                        )
+                        if resp.status_code in (200, 201, 204):
+                            sent = True
+                            break
+                        print(f"  HTTP {resp.status_code} (attempt {attempt+1})")
+                    except requests.RequestException as exc:
+                        print(f"  HTTP error (attempt {attempt+1}): {exc}")
+                    if attempt < max_retries - 1:
+                        time.sleep(2)
+
+                if not sent:
+                    return False, f"HTTP chunk failed at offset {offset}"
+
+                offset += chunk_len
+                if progress_callback:
+                    progress_callback(offset, filesize)
+    except OSError as exc:
+        # Raised by the read-ahead thread (e.g. EIO from the SD card).
+        return False, f"Read error at offset {offset}: {exc}"
 
     return True, "Upload complete"
@@ -5,13 +5,75 @@ Lightweight Flask app to display status and logs.
 """
 
 import os
+import re
+import struct
 import subprocess
+import time
+import atexit
+import functools
 import json
 from datetime import datetime
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, Response, jsonify
+from markupsafe import escape
+
+# Optional in-process systemd access; without them we fork systemctl/journalctl.
+try:
+    from systemd import journal as _journal
+except ImportError:
+    _journal = None
+try:
+    from pystemd.systemd1 import Unit as _SystemdUnit
+except ImportError:
+    _SystemdUnit = None
+
+SERVICE_UNIT = 'airbridge.service'
+# Upper bound for /api/logs?n=: each distinct n is its own get_logs() cache
+# entry and journal read.
+LOG_LINES_MAX = 500
 
 app = Flask(__name__)
 
+CONFIG_PATH = '/home/cedric/config.yaml'
+
+def _load_config():
+    """Parse config.yaml once at import; the page polls every second."""
+    import yaml
+    try:
+        with open(CONFIG_PATH, 'r') as f:
+            loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+            return yaml.load(f, Loader=loader) or {}
+    except (OSError, yaml.YAMLError):
+        return {}
+
+_CFG = _load_config()
+
+def ttl_cache(seconds, maxsize=32):
+    """Memoize a function per argument tuple for `seconds`, so page refreshes
+    are served from memory instead of forking systemctl/journalctl/nmcli.
+    Holds at most `maxsize` entries: expired ones are dropped first, then the
+    oldest."""
+    def deco(fn):
+        cache = {}
+        @functools.wraps(fn)
+        def wrap(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            hit = cache.get(key)
+            if hit is not None and now - hit[0] < seconds:
+                return hit[1]
+            value = fn(*args, **kwargs)
+            cache.pop(key, None)        # re-insert at the end (newest)
+            if len(cache) >= maxsize:
+                for k, (t, _) in list(cache.items()):
+                    if now - t >= seconds:
+                        cache.pop(k, None)
+                while len(cache) >= maxsize:
+                    cache.pop(next(iter(cache), None), None)
+            cache[key] = (now, value)
+            return value
+        return wrap
+    return deco
+
 # HTML template with auto-refresh
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -107,23 +169,23 @@ HTML_TEMPLATE = """
         <div class="status-grid">
             <div class="status-item">
                 <div class="label">Service</div>
-                <div class="value {{ 'status-ok' if status.service_active else 'status-err' }}">
+                <div id="service" class="value {{ 'status-ok' if status.service_active else 'status-err' }}">
                     {{ 'Running' if status.service_active else 'Stopped' }}
                 </div>
             </div>
             <div class="status-item">
                 <div class="label">USB Gadget</div>
-                <div class="value {{ 'status-ok' if status.usb_state == 'configured' else 'status-warn' }}">
+                <div id="usb_state" class="value {{ 'status-ok' if status.usb_state == 'configured' else 'status-warn' }}">
                     {{ status.usb_state | capitalize }}
                 </div>
             </div>
             <div class="status-item">
                 <div class="label">Uptime</div>
-                <div class="value">{{ status.uptime }}</div>
+                <div id="uptime" class="value">{{ status.uptime }}</div>
             </div>
             <div class="status-item">
                 <div class="label">CPU Temp</div>
-                <div class="value {{ 'status-warn' if status.cpu_temp > 70 else '' }}">
+                <div id="cpu_temp" class="value {{ 'status-warn' if status.cpu_temp > 70 else '' }}">
                     {{ status.cpu_temp }}°C
                 </div>
             </div>
@@ -135,15 +197,15 @@ HTML_TEMPLATE = """
         <div class="status-grid">
             <div class="status-item">
                 <div class="label">Partition Size</div>
-                <div class="value">{{ status.usb_disk.size }}</div>
+                <div id="disk_size" class="value">{{ status.usb_disk.size }}</div>
             </div>
             <div class="status-item">
                 <div class="label">Data Written</div>
-                <div class="value" style="font-size: 14px;">{{ "%.1f"|format(status.usb_disk.write_bytes / 1024 / 1024) }} MB</div>
+                <div id="disk_written" class="value" style="font-size: 14px;">{{ "%.1f"|format(status.usb_disk.write_bytes / 1024 / 1024) }} MB</div>
             </div>
             <div class="status-item">
                 <div class="label">Activity</div>
-                <div class="value {{ 'status-ok' if 'Writing' in status.usb_disk.activity else '' }}" style="font-size: 14px;">
+                <div id="disk_activity" class="value {{ 'status-ok' if 'Writing' in status.usb_disk.activity else '' }}" style="font-size: 14px;">
                     {{ status.usb_disk.activity }}
                 </div>
             </div>
@@ -155,17 +217,17 @@ HTML_TEMPLATE = """
         <div class="status-grid">
             <div class="status-item">
                 <div class="label">Signal (CSQ)</div>
-                <div class="value {{ 'status-ok' if status.signal > 15 else 'status-warn' if status.signal > 5 else 'status-err' }}">
+                <div id="signal" class="value {{ 'status-ok' if status.signal > 15 else 'status-warn' if status.signal > 5 else 'status-err' }}">
                     {{ status.signal if status.signal != 99 else 'N/A' }}
                 </div>
             </div>
             <div class="status-item">
                 <div class="label">SSID</div>
-                <div class="value" style="font-size: 14px;">{{ status.ssid or 'Not connected' }}</div>
+                <div id="ssid" class="value" style="font-size: 14px;">{{ status.ssid or 'Not connected' }}</div>
             </div>
             <div class="status-item">
                 <div class="label">Connected</div>
-                <div class="value {{ 'status-ok' if status.net_connected else 'status-err' }}">
+                <div id="net_connected" class="value {{ 'status-ok' if status.net_connected else 'status-err' }}">
                     {{ 'Yes' if status.net_connected else 'No' }}
                 </div>
             </div>
@@ -177,13 +239,13 @@ HTML_TEMPLATE = """
         <div class="status-grid">
             <div class="status-item">
                 <div class="label">Pending Files</div>
-                <div class="value {{ 'status-warn' if status.pending_count > 0 else '' }}">
+                <div id="pending" class="value {{ 'status-warn' if status.pending_count > 0 else '' }}">
                     {{ status.pending_count if status.pending_count >= 0 else '?' }}
                 </div>
             </div>
             <div class="status-item">
                 <div class="label">Current Upload</div>
-                <div class="value" style="font-size: 14px;">
+                <div id="upload_pct" class="value" style="font-size: 14px;">
                     {% if status.upload_progress %}
                         {{ status.upload_progress.pct }}%
                     {% else %}
@@ -192,14 +254,14 @@ HTML_TEMPLATE = """
                 </div>
             </div>
         </div>
-        {% if status.upload_progress %}
-        <div style="margin-top: 10px; background: #0a0a0a; border-radius: 4px; padding: 2px;">
-            <div style="background: #00d4ff; height: 20px; border-radius: 3px; width: {{ status.upload_progress.pct }}%;"></div>
-        </div>
-        <div style="font-size: 11px; color: #666; margin-top: 5px;">
-            {{ status.upload_progress.file }} - {{ status.upload_progress.bytes_sent }} / {{ status.upload_progress.filesize }} bytes
+        <div id="upload_detail" style="display: {{ 'block' if status.upload_progress else 'none' }};">
+            <div style="margin-top: 10px; background: #0a0a0a; border-radius: 4px; padding: 2px;">
+                <div id="upload_bar" style="background: #00d4ff; height: 20px; border-radius: 3px; width: {{ status.upload_progress.pct if status.upload_progress else 0 }}%;"></div>
+            </div>
+            <div id="upload_file" style="font-size: 11px; color: #666; margin-top: 5px;">
+                {% if status.upload_progress %}{{ status.upload_progress.file }} - {{ status.upload_progress.bytes_sent }} / {{ status.upload_progress.filesize }} bytes{% endif %}
+            </div>
         </div>
-        {% endif %}
     </div>
 
     <div class="card">
@@ -212,11 +274,51 @@ HTML_TEMPLATE = """
         <div class="logs" id="logs">{{ logs | safe }}</div>
     </div>
 
-    <p class="refresh-info">Auto-refresh every 10 seconds | Last update: {{ status.timestamp }}</p>
+    <p class="refresh-info">Live updates | Last update: <span id="timestamp">{{ status.timestamp }}</span></p>
 
     <script>
-        // Auto-refresh page every 1 second
-        setTimeout(() => location.reload(), 1000);
+        function setVal(id, text, cls) {
+            const el = document.getElementById(id);
+            el.textContent = text;
+            if (cls !== undefined) el.className = 'value ' + cls;
+        }
+
+        function apply(s) {
+            setVal('service', s.service_active ? 'Running' : 'Stopped',
+                   s.service_active ? 'status-ok' : 'status-err');
+            setVal('usb_state', s.usb_state.charAt(0).toUpperCase() + s.usb_state.slice(1).toLowerCase(),
+                   s.usb_state === 'configured' ? 'status-ok' : 'status-warn');
+            setVal('uptime', s.uptime);
+            setVal('cpu_temp', s.cpu_temp + '°C', s.cpu_temp > 70 ? 'status-warn' : '');
+            setVal('disk_size', s.usb_disk.size);
+            setVal('disk_written', (s.usb_disk.write_bytes / 1024 / 1024).toFixed(1) + ' MB');
+            setVal('disk_activity', s.usb_disk.activity,
+                   s.usb_disk.activity.includes('Writing') ? 'status-ok' : '');
+            setVal('signal', s.signal !== 99 ? s.signal : 'N/A',
+                   s.signal > 15 ? 'status-ok' : s.signal > 5 ? 'status-warn' : 'status-err');
+            setVal('ssid', s.ssid || 'Not connected');
+            setVal('net_connected', s.net_connected ? 'Yes' : 'No',
+                   s.net_connected ? 'status-ok' : 'status-err');
+            setVal('pending', s.pending_count >= 0 ? s.pending_count : '?',
+                   s.pending_count > 0 ? 'status-warn' : '');
+            const p = s.upload_progress;
+            setVal('upload_pct', p ? p.pct + '%' : 'Idle');
+            document.getElementById('upload_detail').style.display = p ? 'block' : 'none';
+            if (p) {
+                document.getElementById('upload_bar').style.width = p.pct + '%';
+                document.getElementById('upload_file').textContent =
+                    p.file + ' - ' + p.bytes_sent + ' / ' + p.filesize + ' bytes';
+            }
+            document.getElementById('timestamp').textContent = s.timestamp;
+        }
+
+        // Server pushes a status snapshot whenever it changes; fall back to
+        // reloading the page on browsers without EventSource.
+        if (window.EventSource) {
+            new EventSource('/events').onmessage = e => apply(JSON.parse(e.data));
+        } else {
+            setTimeout(() => location.reload(), 5000);
+        }
 
         function fetchLogs(n) {
             fetch('/api/logs?n=' + n)
@@ -234,21 +336,66 @@ HTML_TEMPLATE = """
 </html>
 """
 
+def _minify(html):
+    """Collapse CSS whitespace and inter-tag whitespace in the static template."""
+    html = re.sub(r'<style>(.*?)</style>',
+                  lambda m: '<style>' + re.sub(r'\s+', ' ', m.group(1)).strip() + '</style>',
+                  html, flags=re.S)
+    return re.sub(r'>\s+<', '><', html)
+
+# Minified and compiled once, instead of render_template_string handing the
+# raw source to Jinja on every request.
+_TEMPLATE = app.jinja_env.from_string(_minify(HTML_TEMPLATE))
+
+@ttl_cache(2)
 def get_service_status():
     """Check if airbridge service is active."""
+    if _SystemdUnit is not None:
+        try:
+            unit = _SystemdUnit(SERVICE_UNIT.encode(), _autoload=True)
+            return unit.Unit.ActiveState == b'active'
+        except Exception:
+            pass
     result = subprocess.run(
-        ["systemctl", "is-active", "airbridge.service"],
+        ["systemctl", "is-active", SERVICE_UNIT],
         capture_output=True, text=True
     )
     return result.stdout.strip() == "active"
 
+def _sysread(path, n=256):
+    """Read a small /proc or /sys file with raw os calls (no io object stack)."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, n)
+    finally:
+        os.close(fd)
+
+# fds for attributes read on every refresh, opened on first use and kept open:
+# procfs/sysfs regenerate the content on each pread at offset 0.
+_pinned_fds = {}
+
+def _pread_pinned(path, n=64):
+    fd = _pinned_fds.get(path)
+    if fd is None:
+        fd = os.open(path, os.O_RDONLY)
+        kept = _pinned_fds.setdefault(path, fd)
+        if kept != fd:          # another request thread won the race
+            os.close(fd)
+            fd = kept
+    return os.pread(fd, n, 0)
+
+@atexit.register
+def _close_pinned_fds():
+    for fd in _pinned_fds.values():
+        os.close(fd)
+    _pinned_fds.clear()
+
 def get_usb_state():
     """Get USB gadget state."""
     try:
         udc_dirs = os.listdir("/sys/class/udc/")
         if udc_dirs:
-            with open(f"/sys/class/udc/{udc_dirs[0]}/state", 'r') as f:
-                return f.read().strip()
+            return _sysread(f"/sys/class/udc/{udc_dirs[0]}/state", 64).decode().strip()
     except:
         pass
     return "unknown"
@@ -256,8 +403,7 @@ def get_usb_state():
 def get_uptime():
     """Get system uptime."""
     try:
-        with open('/proc/uptime', 'r') as f:
-            uptime_seconds = float(f.readline().split()[0])
+        uptime_seconds = float(_pread_pinned('/proc/uptime').split(b' ', 1)[0])
         hours = int(uptime_seconds // 3600)
         minutes = int((uptime_seconds % 3600) // 60)
         if hours > 24:
@@ -271,12 +417,12 @@ def get_uptime():
 def get_cpu_temp():
     """Get CPU temperature."""
     try:
-        with open('/sys/class/thermal/thermal_zone0/temp', 'r') as f:
-            temp = int(f.read().strip()) / 1000
+        temp = int(_pread_pinned('/sys/class/thermal/thermal_zone0/temp', 16)) / 1000
         return round(temp, 1)
     except:
         return 0
 
+@ttl_cache(5)
 def get_wifi_status():
     """Get WiFi status via wifi_manager."""
     import sys
@@ -296,91 +442,86 @@ def get_wifi_status():
 # Track previous disk stats for activity detection
 _last_disk_stats = {'writes': 0, 'timestamp': 0}
 
+@functools.lru_cache(maxsize=1)
+def _partition_sysfs_dir(disk_path):
+    """/sys/block/<disk>/<part> for a /dev partition path (e.g. /dev/mmcblk0p3)."""
+    part_name = disk_path.replace('/dev/', '')
+    # Handle both /dev/mmcblk0p3 and /dev/sda1 formats
+    if 'mmcblk' in part_name:
+        disk_name = part_name.rstrip('0123456789').rstrip('p')  # mmcblk0
+    else:
+        disk_name = part_name.rstrip('0123456789')  # sda
+    return f"/sys/block/{disk_name}/{part_name}"
+
+@ttl_cache(2)
 def get_usb_disk_info():
     """Get USB disk size and activity info."""
-    import yaml
     import time
 
     global _last_disk_stats
 
     try:
-        with open('/home/cedric/config.yaml', 'r') as f:
-            cfg = yaml.safe_load(f)
-
-        disk_path = cfg.get('virtual_disk_path', '/dev/mmcblk0p3')
+        disk_path = _CFG.get('virtual_disk_path', '/dev/mmcblk0p3')
 
-        # Extract partition name (e.g., mmcblk0p3)
         if disk_path.startswith('/dev/'):
-            part_name = disk_path.replace('/dev/', '')
-            # Handle both /dev/mmcblk0p3 and /dev/sda1 formats
-            if 'mmcblk' in part_name:
-                disk_name = part_name.rstrip('0123456789').rstrip('p')  # mmcblk0
+            sysfs_dir = _partition_sysfs_dir(disk_path)
+
+            # Get partition size (in 512-byte sectors); a missing partition
+            # raises here and falls through to 'Unknown'
+            size_bytes = int(_sysread(f"{sysfs_dir}/size", 32)) * 512
+
+            # Get I/O stats
+            # Format: reads_completed reads_merged read_sectors read_ms
+            #         writes_completed writes_merged write_sectors write_ms ...
+            write_sectors = 0
+            try:
+                write_sectors = int(_sysread(f"{sysfs_dir}/stat").split(None, 7)[6])
+            except (OSError, IndexError, ValueError):
+                pass
+
+            # Calculate write activity
+            now = time.time()
+            write_bytes = write_sectors * 512
+            activity = "Idle"
+
+            if _last_disk_stats['timestamp'] > 0:
+                time_diff = now - _last_disk_stats['timestamp']
+                if time_diff > 0:
+                    bytes_diff = write_bytes - _last_disk_stats['writes']
+                    if bytes_diff > 0:
+                        rate = bytes_diff / time_diff
+                        if rate > 1024 * 1024:
+                            activity = f"Writing {rate/1024/1024:.1f} MB/s"
+                        elif rate > 1024:
+                            activity = f"Writing {rate/1024:.1f} KB/s"
+                        elif rate > 0:
+                            activity = f"Writing {rate:.0f} B/s"
+
+            _last_disk_stats['writes'] = write_bytes
+            _last_disk_stats['timestamp'] = now
+
+            # Format size
+            if size_bytes >= 1024 * 1024 * 1024:
+                size_str = f"{size_bytes / 1024 / 1024 / 1024:.1f} GB"
             else:
-                disk_name = part_name.rstrip('0123456789')  # sda
-
-            # Get partition size (in 512-byte sectors)
-            size_path = f"/sys/block/{disk_name}/{part_name}/size"
-            if os.path.exists(size_path):
-                with open(size_path, 'r') as f:
-                    sectors = int(f.read().strip())
-                size_bytes = sectors * 512
-
-                # Get I/O stats
-                stat_path = f"/sys/block/{disk_name}/{part_name}/stat"
-                write_sectors = 0
-                if os.path.exists(stat_path):
-                    with open(stat_path, 'r') as f:
-                        stats = f.read().split()
-                        # Format: reads_completed reads_merged read_sectors read_ms
-                        #         writes_completed writes_merged write_sectors write_ms ...
-                        if len(stats) >= 7:
-                            write_sectors = int(stats[6])  # write_sectors
-
-                # Calculate write activity
-                now = time.time()
-                write_bytes = write_sectors * 512
-                activity = "Idle"
-
-                if _last_disk_stats['timestamp'] > 0:
-                    time_diff = now - _last_disk_stats['timestamp']
-                    if time_diff > 0:
-                        bytes_diff = write_bytes - _last_disk_stats['writes']
-                        if bytes_diff > 0:
-                            rate = bytes_diff / time_diff
-                            if rate > 1024 * 1024:
-                                activity = f"Writing {rate/1024/1024:.1f} MB/s"
-                            elif rate > 1024:
-                                activity = f"Writing {rate/1024:.1f} KB/s"
-                            elif rate > 0:
-                                activity = f"Writing {rate:.0f} B/s"
-
-                _last_disk_stats['writes'] = write_bytes
-                _last_disk_stats['timestamp'] = now
-
-                # Format size
-                if size_bytes >= 1024 * 1024 * 1024:
-                    size_str = f"{size_bytes / 1024 / 1024 / 1024:.1f} GB"
-                else:
-                    size_str = f"{size_bytes / 1024 / 1024:.0f} MB"
+                size_str = f"{size_bytes / 1024 / 1024:.0f} MB"
 
-                return {
-                    'size': size_str,
-                    'size_bytes': size_bytes,
-                    'write_bytes': write_bytes,
-                    'activity': activity
-                }
+            return {
+                'size': size_str,
+                'size_bytes': size_bytes,
+                'write_bytes': write_bytes,
+                'activity': activity
+            }
         else:
-            # File-backed image
-            if os.path.exists(disk_path):
-                size_bytes = os.path.getsize(disk_path)
-                mtime = os.path.getmtime(disk_path)
-                size_str = f"{size_bytes / 1024 / 1024:.0f} MB"
-                return {
-                    'size': size_str,
-                    'size_bytes': size_bytes,
-                    'write_bytes': 0,
-                    'activity': 'File-backed'
-                }
+            # File-backed image: one stat, raises if missing
+            size_bytes = os.stat(disk_path).st_size
+            size_str = f"{size_bytes / 1024 / 1024:.0f} MB"
+            return {
+                'size': size_str,
+                'size_bytes': size_bytes,
+                'write_bytes': 0,
+                'activity': 'File-backed'
+            }
     except Exception as e:
         pass
 
@@ -392,22 +533,27 @@ def get_pending_uploads():
     outbox = "/mnt/usb_logs/.airbridge_outbox"
     try:
         if os.path.exists(outbox):
-            files = [f for f in os.listdir(outbox) if f.endswith(('.zip', '.gz'))]
+            files = [f for f in os.listdir(outbox) if f.endswith(('.zip', '.gz', '.zst'))]
             return len(files)
     except:
         pass
     # Can't check when disk is in gadget mode (not mounted)
     return -1  # -1 indicates unknown
 
+# Written by main.py: <Qd header (bytes_sent, timestamp) + UTF-8 file path.
+_PROGRESS_FILE = "/tmp/airbridge_upload_progress.bin"
+_PROGRESS_FMT  = struct.Struct('<Qd')
+
 def get_upload_progress():
     """Get current upload progress if any."""
-    progress_file = "/tmp/airbridge_upload_progress.json"
     try:
-        if os.path.exists(progress_file):
-            with open(progress_file, 'r') as f:
-                data = json.load(f)
-            filepath = data.get('filepath', '')
-            bytes_sent = data.get('bytes_sent', 0)
+        if os.path.exists(_PROGRESS_FILE):
+            with open(_PROGRESS_FILE, 'rb') as f:
+                data = f.read()
+            if len(data) <= _PROGRESS_FMT.size:
+                return None
+            bytes_sent, _ = _PROGRESS_FMT.unpack_from(data)
+            filepath = data[_PROGRESS_FMT.size:].decode(errors='replace')
             # Try to get file size
             if os.path.exists(filepath):
                 filesize = os.path.getsize(filepath)
@@ -422,35 +568,59 @@ def get_upload_progress():
         pass
     return None
 
+def _journal_tail(n):
+    """Last n entries of the unit's journal, formatted like `journalctl -o short`."""
+    reader = _journal.Reader()
+    try:
+        reader.add_match(_SYSTEMD_UNIT=SERVICE_UNIT)
+        reader.seek_tail()
+        entries = []
+        for _ in range(n):
+            entry = reader.get_previous()
+            if not entry:
+                break
+            entries.append(entry)
+    finally:
+        reader.close()
+    lines = []
+    for e in reversed(entries):
+        ts = e.get('__REALTIME_TIMESTAMP')
+        lines.append(f"{ts:%b %d %H:%M:%S} {e.get('_HOSTNAME', '')} "
+                     f"{e.get('SYSLOG_IDENTIFIER', '')}[{e.get('_PID', '')}]: "
+                     f"{e.get('MESSAGE', '')}")
+    return lines
+
+# Wraps each log line in a level span in one pass.  Alternation order gives
+# the precedence error > warn > INFO; the lookaheads never cross a newline.
+_LOG_LEVEL_RE = re.compile(
+    r'(?im)^(?:(?P<err>(?=.*error))|(?P<warn>(?=.*warn))|(?P<info>(?-i:(?=.*INFO)))).+$')
+
+def _colorize_line(m):
+    return f'<span class="{m.lastgroup}">{m.group(0)}</span>'
+
+@ttl_cache(10)
 def get_logs(n=50):
-    """Get recent logs from journalctl."""
+    """Get recent logs from the journal (sd-journal if available, else journalctl)."""
     try:
-        result = subprocess.run(
-            ["journalctl", "-u", "airbridge.service", "-n", str(n), "--no-pager", "-o", "short"],
-            capture_output=True, text=True
-        )
-        lines = result.stdout.strip().split('\n')
-        # Colorize log levels
-        colored = []
-        for line in lines:
-            if 'ERROR' in line or 'error' in line.lower():
-                colored.append(f'<span class="err">{line}</span>')
-            elif 'WARNING' in line or 'warn' in line.lower():
-                colored.append(f'<span class="warn">{line}</span>')
-            elif 'INFO' in line:
-                colored.append(f'<span class="info">{line}</span>')
-            else:
-                colored.append(line)
-        return '\n'.join(colored)
+        if _journal is not None:
+            text = '\n'.join(_journal_tail(n))
+        else:
+            result = subprocess.run(
+                ["journalctl", "-u", SERVICE_UNIT, "-n", str(n), "--no-pager", "-o", "short"],
+                capture_output=True, text=True
+            )
+            # Classified in place: the multiline regex needs no line list
+            text = result.stdout.strip()
+        # Escape once (the template renders this | safe), then colorize
+        return _LOG_LEVEL_RE.sub(_colorize_line, str(escape(text)))
     except Exception as e:
         return f"Error reading logs: {e}"
 
-@app.route('/')
-def index():
-    """Main status page."""
+def _snapshot(timestamp_fmt='%H:%M:%S'):
+    """Collect every status field (slow probes come from the TTL cache)."""
     signal, ssid, net_connected = get_wifi_status()
 
-    status = {
+    return {
         'service_active': get_service_status(),
         'usb_state': get_usb_state(),
         'usb_disk': get_usb_disk_info(),
@@ -461,39 +631,74 @@ def index():
         'net_connected': net_connected,
         'pending_count': get_pending_uploads(),
         'upload_progress': get_upload_progress(),
-        'timestamp': datetime.now().strftime('%H:%M:%S')
+        'timestamp': datetime.now().strftime(timestamp_fmt)
     }
 
+@app.after_request
+def _no_store(resp):
+    """Status is live data: never let the browser serve a stale copy."""
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+@app.route('/')
+def index():
+    """Main status page."""
+    status = _snapshot()
     logs = get_logs(50)
 
-    return render_template_string(HTML_TEMPLATE, status=status, logs=logs)
+    return _TEMPLATE.render(status=status, logs=logs)
 
 @app.route('/api/status')
 def api_status():
     """JSON API for status."""
-    signal, ssid, net_connected = get_wifi_status()
-
-    return jsonify({
-        'service_active': get_service_status(),
-        'usb_state': get_usb_state(),
-        'usb_disk': get_usb_disk_info(),
-        'uptime': get_uptime(),
-        'cpu_temp': get_cpu_temp(),
-        'signal': signal,
-        'ssid': ssid,
-        'net_connected': net_connected,
-        'pending_count': get_pending_uploads(),
-        'upload_progress': get_upload_progress(),
-        'timestamp': datetime.now().isoformat()
-    })
+    return jsonify(_snapshot('%Y-%m-%dT%H:%M:%S.%f'))
+
+# Server-Sent Events: one snapshot per second, sent only when something other
+# than the timestamp changed, plus a comment line as keep-alive.
+SSE_INTERVAL = 1.0
+SSE_KEEPALIVE = 15.0
+
+@app.route('/events')
+def events():
+    """Push status snapshots to the page over a single long-lived response."""
+    def stream():
+        last = None
+        last_sent = time.monotonic()
+        while True:
+            snap = _snapshot()
+            ts = snap.pop('timestamp')
+            body = json.dumps(snap, sort_keys=True)
+            now = time.monotonic()
+            if body != last:
+                last = body
+                last_sent = now
+                snap['timestamp'] = ts
+                yield f'data: {json.dumps(snap)}\n\n'
+            elif now - last_sent >= SSE_KEEPALIVE:
+                last_sent = now
+                yield ': keep-alive\n\n'
+            time.sleep(SSE_INTERVAL)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
 
 @app.route('/api/logs')
 def api_logs():
     """JSON API for logs."""
     from flask import request
-    n = request.args.get('n', 50, type=int)
+    n = max(1, min(request.args.get('n', 50, type=int), LOG_LINES_MAX))
     return jsonify({'logs': get_logs(n)})
 
 if __name__ == '__main__':
-    # Run on all interfaces, port 8080
-    app.run(host='0.0.0.0', port=8080, debug=False)
+    # Run on all interfaces, port 8080.  Prefer waitress (pure-Python WSGI
+    # server with a thread pool) so slow probes and open /events streams
+    # don't queue other requests; fall back to Werkzeug's threaded server.
+    try:
+        from waitress import serve
+    except ImportError:
+        app.run(host='0.0.0.0', port=8080, debug=False, threaded=True)
+    else:
+        # Each open /events stream holds a thread, hence headroom above the
+        # 4 the probes need; channel_timeout stays above SSE_KEEPALIVE.
+        serve(app, host='0.0.0.0', port=8080, threads=8,
+              connection_limit=32, channel_timeout=30)
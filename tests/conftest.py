@@ -18,14 +18,20 @@ Example runs
   pytest --pi-host ... --usb-device /dev/sdb     # + USB-cable write test
 """
 
+import os
 import subprocess
+import tempfile
 import pytest
 import yaml
 
 DEFAULT_HOST = "cedric@pizerologs.local"
-_SSH_OPTS    = ["-o", "ConnectTimeout=10",
+_BATCH_SEP   = "--airbridge-batch-rc--"
+_SSH_OPTS    = ("-T",  # no pty: none of the remote commands are interactive
+                "-o", "ConnectTimeout=10",
                 "-o", "BatchMode=yes",
-                "-o", "StrictHostKeyChecking=no"]
+                "-o", "StrictHostKeyChecking=no")
+# libyaml's C loader when PyYAML was built with it; same results, far faster.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 # ── CLI options ───────────────────────────────────────────────────────────────
@@ -74,16 +80,33 @@ def pytest_collection_modifyitems(config, items):
 # ── SSH helper ────────────────────────────────────────────────────────────────
 
 class SSHRunner:
-    """Thin SSH wrapper used by hardware/WiFi/USB tests."""
+    """
+    Thin SSH wrapper used by hardware/WiFi/USB tests.  All calls share one
+    multiplexed connection (OpenSSH ControlMaster), so only the first pays
+    for the TCP handshake and key exchange.
+    """
 
     def __init__(self, host: str):
         self.host = host
-        self._base = ["ssh"] + _SSH_OPTS + [host]
+        self._control = os.path.join(tempfile.gettempdir(),
+                                     f"ssh-airbridge-{os.getpid()}")
+        # Built once as a tuple; each call just appends its command.
+        self._base = ("ssh", *_SSH_OPTS,
+                      "-o", "ControlMaster=auto",
+                      "-o", f"ControlPath={self._control}",
+                      "-o", "ControlPersist=600", host)
+
+    def close(self) -> None:
+        """Shut down the shared master connection, if one was started."""
+        subprocess.run(
+            ["ssh", "-o", f"ControlPath={self._control}", "-O", "exit", self.host],
+            capture_output=True, timeout=10,
+        )
 
     def run(self, cmd: str, timeout: int = 30) -> subprocess.CompletedProcess:
         """Run *cmd* on the Pi; never raises on non-zero exit."""
         return subprocess.run(
-            self._base + [cmd],
+            (*self._base, cmd),
             capture_output=True, text=True, timeout=timeout,
         )
 
@@ -98,6 +121,26 @@ class SSHRunner:
         )
         return r
 
+    def batch(self, cmds: list, timeout: int = 30) -> list:
+        """
+        Run several commands in one SSH round trip, in order.  Every command
+        runs regardless of earlier failures; returns ``[(returncode, stdout)]``
+        per command.
+        """
+        script = "\n".join(f"{c}\necho \"{_BATCH_SEP} $?\"" for c in cmds)
+        r = self.run(script, timeout=timeout)
+        parts = r.stdout.split(_BATCH_SEP + " ")
+        results, out = [], parts[0]
+        for part in parts[1:]:
+            rc, _, rest = part.partition("\n")
+            results.append((int(rc), out))
+            out = rest
+        assert len(results) == len(cmds), (
+            f"SSH batch stopped after {len(results)}/{len(cmds)} commands "
+            f"(exit {r.returncode}): {r.stderr.strip()!r}"
+        )
+        return results
+
     def python(self, code: str, timeout: int = 30) -> subprocess.CompletedProcess:
         """Run a Python snippet on the Pi via ``python3 -c``."""
         return self.check(f"python3 -c {code!r}", timeout=timeout)
@@ -105,7 +148,7 @@ class SSHRunner:
     def script(self, code: str, timeout: int = 30) -> subprocess.CompletedProcess:
         """Run a multiline Python script on the Pi by piping it to python3 stdin."""
         return subprocess.run(
-            self._base + ["python3 -"],
+            (*self._base, "python3 -"),
             input=code, capture_output=True, text=True, timeout=timeout,
         )
 
@@ -122,8 +165,10 @@ def ssh(request):
     runner = SSHRunner(host)
     r = runner.run("echo pong", timeout=8)
     if r.returncode != 0 or "pong" not in r.stdout:
+        runner.close()
         pytest.skip(f"Pi not reachable at {host}: {r.stderr.strip() or 'timeout'}")
-    return runner
+    yield runner
+    runner.close()
 
 
 @pytest.fixture(scope="session")
@@ -135,7 +180,7 @@ def pi_config(ssh):
     )
     assert r.returncode == 0 and r.stdout.strip(), \
         "config.yaml not found on Pi – deploy with: scp config.yaml cedric@pi:~"
-    return yaml.safe_load(r.stdout)
+    return yaml.load(r.stdout, Loader=_YAML_LOADER)
 
 
 @pytest.fixture(scope="session")
@@ -4,12 +4,17 @@ Integration Test: USB Air Bridge Device Connected via USB and SSH
 Tests assume the Air Bridge device is physically connected via USB and accessible over SSH.
 """
 
+import collections
+import ctypes
+import json
 import os
+import select
 import sys
 import time
 import subprocess
 import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Configuration for the connected Air Bridge device
@@ -22,17 +27,32 @@ DEVICE_CONFIG = {
     'quiet_window': 30,  # seconds to wait for file system to stabilize
 }
 
+# Filler for every test file, built once rather than per file.
+_PAD = b'X' * (DEVICE_CONFIG['test_file_size'] - 200)
+
 class USBAirBridgeIntegrationTest:
     def __init__(self):
-        self.ssh_prefix = f"ssh {DEVICE_CONFIG['ssh_user']}@{DEVICE_CONFIG['ssh_host']}"
+        # One multiplexed connection for the whole run: later ssh calls ride
+        # the master's socket instead of paying a fresh TCP + auth handshake.
+        self.ssh_target = f"{DEVICE_CONFIG['ssh_user']}@{DEVICE_CONFIG['ssh_host']}"
+        self.ssh_control = os.path.join(tempfile.gettempdir(),
+                                        f"airbridge_ssh_{uuid.uuid4().hex[:12]}.sock")
+        # -T/BatchMode: no pty per command and never a password prompt that
+        # would hang an unattended run.
+        self.ssh_argv = ("ssh", "-T", "-o", "BatchMode=yes",
+                         "-o", "StrictHostKeyChecking=accept-new",
+                         "-o", "ControlMaster=auto",
+                         "-o", f"ControlPath={self.ssh_control}",
+                         "-o", "ControlPersist=60s", self.ssh_target)
         self.usb_device = None
         self.mount_point = DEVICE_CONFIG['mount_point']
         self.test_files = []
         
-    def run_local_cmd(self, cmd, check=True, capture=True):
-        """Run a command on the local machine."""
+    def run_local_cmd(self, argv, check=True, capture=True):
+        """Run an argv list on the local machine (no intermediate shell)."""
+        cmd = " ".join(argv)
         print(f"LOCAL: {cmd}")
-        result = subprocess.run(cmd, shell=True, capture_output=capture, text=True)
+        result = subprocess.run(argv, capture_output=capture, text=True)
         if capture and result.stdout:
             print(f"STDOUT: {result.stdout.strip()}")
         if capture and result.stderr:
@@ -43,9 +63,8 @@ class USBAirBridgeIntegrationTest:
         
     def run_remote_cmd(self, cmd, check=True, capture=True):
         """Run a command on the remote Air Bridge device via SSH."""
-        full_cmd = f"{self.ssh_prefix} \"{cmd}\""
         print(f"REMOTE: {cmd}")
-        result = subprocess.run(full_cmd, shell=True, capture_output=capture, text=True)
+        result = subprocess.run((*self.ssh_argv, cmd), capture_output=capture, text=True)
         if capture and result.stdout:
             print(f"STDOUT: {result.stdout.strip()}")
         if capture and result.stderr:
@@ -53,31 +72,45 @@ class USBAirBridgeIntegrationTest:
         if check and result.returncode != 0:
             raise Exception(f"Remote command failed: {cmd}")
         return result
+
+    def run_remote_batch(self, cmds):
+        """
+        Run several independent remote commands in one SSH round trip.
+        Returns each command's stripped stdout, in order; a failing command
+        just yields its (possibly empty) output.
+        """
+        result = self.run_remote_cmd("; printf '\\0'; ".join(cmds), check=False)
+        return [out.strip() for out in result.stdout.split("\0")]
         
     def detect_usb_device(self):
         """Detect the Air Bridge USB device on the local machine."""
         print("Detecting USB Air Bridge device...")
         
         # Get list of mass storage devices
-        result = self.run_local_cmd("lsblk -o NAME,SIZE,TYPE,MOUNTPOINT | grep disk", check=False)
+        result = self.run_local_cmd(["lsblk", "-J", "-d", "-o", "NAME,SIZE,TYPE,MOUNTPOINT"],
+                                    check=False)
         devices = []
         
-        for line in result.stdout.split('\n'):
-            if line.strip() and 'disk' in line:
-                parts = line.split()
-                if len(parts) >= 3:
-                    name = parts[0]
-                    size = parts[1]
-                    devices.append(f"/dev/{name}")
-                    print(f"  Found storage device: /dev/{name} ({size})")
+        try:
+            blockdevices = json.loads(result.stdout).get("blockdevices", [])
+        except ValueError:
+            blockdevices = []
+        for dev in blockdevices:
+            if dev.get("type") == "disk":
+                devices.append(f"/dev/{dev['name']}")
+                print(f"  Found storage device: /dev/{dev['name']} ({dev.get('size')})")
         
-        # Look for recently connected devices in dmesg
-        result = self.run_local_cmd("dmesg | tail -20 | grep -i usb", check=False)
-        if result.stdout:
+        # Look for recently connected devices in dmesg.  Stream it and keep
+        # only the last 20 lines rather than capturing the whole ring buffer.
+        with subprocess.Popen(["dmesg"], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True,
+                              errors="replace") as proc:
+            tail = collections.deque(proc.stdout, maxlen=20)
+        usb_lines = [l.strip() for l in tail if 'usb' in l.lower()]
+        if usb_lines:
             print("Recent USB activity:")
-            for line in result.stdout.split('\n'):
-                if line.strip():
-                    print(f"  {line.strip()}")
+            for line in usb_lines:
+                print(f"  {line}")
         
         # For now, we'll need manual selection or auto-detect based on size/timing
         # This is a simplified approach - in practice you might want more sophisticated detection
@@ -104,17 +137,18 @@ class USBAirBridgeIntegrationTest:
         """Check the status of the Air Bridge device and services."""
         print("Checking Air Bridge device status...")
         try:
-            # Check if airbridge service is running
-            self.run_remote_cmd("systemctl is-active airbridge.service")
+            # Service, gadget state and virtual disk in one round trip
+            service, state, disk = self.run_remote_batch([
+                "systemctl is-active airbridge.service",
+                "cat /sys/class/udc/*/state 2>/dev/null || echo 'not_configured'",
+                "ls -la /dev/mmcblk0p3 2>/dev/null || ls -la /piusb.bin 2>/dev/null",
+            ])
+            if service != "active":
+                raise Exception(f"airbridge.service is {service or 'unknown'}")
             print("✓ Airbridge service is active")
-            
-            # Check USB gadget status
-            result = self.run_remote_cmd("cat /sys/class/udc/*/state 2>/dev/null || echo 'not_configured'")
-            state = result.stdout.strip()
             print(f"✓ USB gadget state: {state}")
-            
-            # Check for virtual disk
-            self.run_remote_cmd("ls -la /dev/mmcblk0p3 || ls -la /piusb.bin")
+            if not disk:
+                raise Exception("Virtual disk not found")
             print("✓ Virtual disk found")
             
             return True
@@ -130,16 +164,37 @@ class USBAirBridgeIntegrationTest:
         os.makedirs(self.mount_point, exist_ok=True)
         
         # Mount the USB device locally
-        self.run_local_cmd(f"sudo umount {self.mount_point} 2>/dev/null || true", check=False)
-        self.run_local_cmd(f"sudo mount {self.usb_device} {self.mount_point}")
+        self.run_local_cmd(["sudo", "umount", self.mount_point], check=False)
+        self.run_local_cmd(["sudo", "mount", self.usb_device, self.mount_point])
         
-        # Create test files
-        for i in range(3):
-            filename = f"test_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.txt"
-            filepath = os.path.join(self.mount_point, filename)
+        # Create test files concurrently so their writes and FAT updates
+        # overlap, then flush the whole mount once.
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            for filename, size in pool.map(self._write_test_file, range(3)):
+                self.test_files.append(filename)
+                print(f"  Created: {filename} ({size} bytes)")
+
+        fd = os.open(self.mount_point, os.O_RDONLY)
+        try:
+            if ctypes.CDLL(None, use_errno=True).syncfs(fd) != 0:
+                os.sync()
+        finally:
+            os.close(fd)
             
-            # Generate test content
-            test_data = f"""Air Bridge Integration Test Log
+        # Unmount
+        time.sleep(1)
+        self.run_local_cmd(["sudo", "umount", self.mount_point])
+        
+        print(f"Created {len(self.test_files)} test files")
+        return True
+
+    def _write_test_file(self, i):
+        """Write one padded test log into the mount; returns (filename, size)."""
+        filename = f"test_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.txt"
+        filepath = os.path.join(self.mount_point, filename)
+
+        # Generate test content
+        header = f"""Air Bridge Integration Test Log
 ============================================
 File: {filename}
 Timestamp: {datetime.now().isoformat()}
@@ -148,22 +203,15 @@ Size: {DEVICE_CONFIG['test_file_size']} bytes
 
 {'=' * 50}
 Test Data:
-{'X' * (DEVICE_CONFIG['test_file_size'] - 200)}
 """
-            
-            with open(filepath, 'w') as f:
-                f.write(test_data)
-                
-            self.test_files.append(filename)
-            print(f"  Created: {filename} ({len(test_data)} bytes)")
-            
-        # Sync and unmount
-        self.run_local_cmd("sync")
-        time.sleep(1)
-        self.run_local_cmd(f"sudo umount {self.mount_point}")
-        
-        print(f"Created {len(self.test_files)} test files")
-        return True
+        # writev() gathers header and the shared pad in one syscall
+        # without concatenating them.
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            size = os.writev(fd, [header.encode(), _PAD, b'\n'])
+        finally:
+            os.close(fd)
+        return filename, size
         
     def wait_for_file_harvesting(self):
         """Wait for the Air Bridge to detect and harvest the files."""
@@ -171,7 +219,48 @@ Test Data:
         
         start_time = time.time()
         timeout = DEVICE_CONFIG['quiet_window'] + 60
-        
+
+        # One long-lived inotifywait on the Pi reports the archive the moment
+        # it lands, instead of an ssh round trip every 5 s.  Exit code 127
+        # means it isn't installed; fall back to polling.
+        proc = subprocess.Popen((
+            *self.ssh_argv,
+            "command -v inotifywait >/dev/null || exit 127; "
+            "exec inotifywait -m -e create -e moved_to --format %f /home/cedric/outbox 2>&1"
+        ), stdout=subprocess.PIPE)
+        try:
+            pending = b""
+            while time.time() - start_time < timeout:
+                remaining = timeout - (time.time() - start_time)
+                if not select.select([proc.stdout], [], [], remaining)[0]:
+                    break
+                chunk = os.read(proc.stdout.fileno(), 4096)
+                if not chunk:
+                    print("inotifywait unavailable on device – polling outbox")
+                    return self._poll_for_archives(start_time, timeout)
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    line = line.decode(errors="replace").strip()
+                    if line == "Watches established.":
+                        # Catch an archive that landed before the watch did.
+                        result = self.run_remote_cmd(
+                            "ls /home/cedric/outbox/*.zip 2>/dev/null | wc -l", check=False)
+                        if int(result.stdout.strip() or 0) > 0:
+                            print("✓ Found archive(s) in outbox")
+                            return True
+                    elif line.endswith(".zip"):
+                        print(f"✓ Archive created in outbox: {line}")
+                        return True
+        finally:
+            proc.kill()
+            proc.wait()
+
+        print(f"\nTimeout waiting for file harvesting")
+        return False
+
+    def _poll_for_archives(self, start_time, timeout):
+        """Fallback for wait_for_file_harvesting: count outbox archives every 5 s."""
         while time.time() - start_time < timeout:
             try:
                 # Check if files were harvested by looking at outbox
@@ -196,16 +285,15 @@ Test Data:
         print("Verifying file upload...")
 
         try:
-            # Check WiFi connectivity
-            result = self.run_remote_cmd(
+            # WiFi connectivity and outbox contents in one round trip
+            wifi, remaining = self.run_remote_batch([
                 "python3 -c \"from wifi_manager import is_connected; print('Connected:', is_connected())\"",
-                check=False,
-            )
-            print(f"✓ WiFi status: {result.stdout.strip()}")
+                "ls /home/cedric/outbox/ 2>/dev/null | wc -l",
+            ])
+            print(f"✓ WiFi status: {wifi}")
 
             # Check if outbox is empty (files uploaded and deleted)
-            result = self.run_remote_cmd("ls /home/cedric/outbox/ 2>/dev/null | wc -l")
-            remaining_files = int(result.stdout.strip())
+            remaining_files = int(remaining)
 
             if remaining_files == 0:
                 print("✓ Outbox is empty - files likely uploaded successfully")
@@ -243,7 +331,7 @@ Test Data:
         
         try:
             # Clean up local mount point
-            self.run_local_cmd(f"sudo umount {self.mount_point} 2>/dev/null || true", check=False)
+            self.run_local_cmd(["sudo", "umount", self.mount_point], check=False)
             if os.path.exists(self.mount_point):
                 os.rmdir(self.mount_point)
                 
@@ -256,6 +344,10 @@ Test Data:
             print("✓ Cleanup completed")
         except Exception as e:
             print(f"Cleanup failed: {e}")
+        finally:
+            # Close the multiplexed master connection.
+            subprocess.run(["ssh", "-o", f"ControlPath={self.ssh_control}",
+                            "-O", "exit", self.ssh_target], capture_output=True)
             
     def run_full_test(self):
         """Run the complete integration test suite."""
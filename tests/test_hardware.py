@@ -7,15 +7,40 @@ Run:
     pytest tests/test_hardware.py --pi-host ... --disruptive
 """
 
-import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 
+# Read-only probes behind the simple checks below.  They don't depend on each
+# other, so the probes fixture runs them all at once over the shared SSH
+# master instead of one round trip per test.
+_PROBES = {
+    "i2c":        "test -c /dev/i2c-1 && echo yes",
+    "wlan0":      "test -d /sys/class/net/wlan0 && echo yes",
+    "udc":        "ls /sys/class/udc/ 2>/dev/null | head -1",
+    "udc_state":  "cat /sys/class/udc/*/state",
+    "config":     ("test -f ~/config.yaml && echo yes "
+                   "|| test -f /home/cedric/USBCellular/config.yaml && echo yes"),
+    "mem_kb":     "awk '/MemAvailable/{print $2}' /proc/meminfo",
+    "disk_free":  "stat -f -c '%a %S' /",   # avail blocks, block size
+    "service":    "systemctl is-enabled airbridge.service 2>/dev/null",
+}
+
+
+@pytest.fixture(scope="module")
+def probes(ssh):
+    """{name: CompletedProcess} for every entry in _PROBES, run concurrently."""
+    with ThreadPoolExecutor(max_workers=len(_PROBES)) as pool:
+        futures = {name: pool.submit(ssh.run, cmd) for name, cmd in _PROBES.items()}
+        return {name: fut.result() for name, fut in futures.items()}
+
+
 # ── I2C / Display ─────────────────────────────────────────────────────────────
 
 @pytest.mark.hardware
-def test_i2c_bus_exists(ssh):
-    r = ssh.run("test -c /dev/i2c-1 && echo yes")
+def test_i2c_bus_exists(probes):
+    r = probes["i2c"]
     assert "yes" in r.stdout, (
         "/dev/i2c-1 not found. "
         "Add dtparam=i2c_arm=on to /boot/firmware/config.txt and reboot, "
@@ -43,8 +68,8 @@ def test_display_handler_importable(ssh):
 # ── WiFi ──────────────────────────────────────────────────────────────────────
 
 @pytest.mark.hardware
-def test_wlan0_exists(ssh):
-    r = ssh.run("test -d /sys/class/net/wlan0 && echo yes")
+def test_wlan0_exists(probes):
+    r = probes["wlan0"]
     assert "yes" in r.stdout, "/sys/class/net/wlan0 not found – WiFi interface missing"
 
 
@@ -60,8 +85,8 @@ def test_wifi_manager_importable(ssh):
 # ── USB gadget / UDC ──────────────────────────────────────────────────────────
 
 @pytest.mark.hardware
-def test_udc_controller_exists(ssh):
-    r = ssh.run("ls /sys/class/udc/ 2>/dev/null | head -1")
+def test_udc_controller_exists(probes):
+    r = probes["udc"]
     assert r.stdout.strip(), (
         "No USB Device Controller – "
         "check dtoverlay=dwc2,dr_mode=peripheral in [all] section of config.txt"
@@ -69,8 +94,9 @@ def test_udc_controller_exists(ssh):
 
 
 @pytest.mark.hardware
-def test_udc_state_is_valid(ssh):
-    r = ssh.check("cat /sys/class/udc/*/state")
+def test_udc_state_is_valid(probes):
+    r = probes["udc_state"]
+    assert r.returncode == 0, f"Could not read UDC state: {r.stderr.strip()!r}"
     state = r.stdout.strip()
     valid = {"configured", "not attached", "suspended", "powered"}
     assert state in valid, f"Unexpected UDC state: {state!r}"
@@ -93,25 +119,21 @@ def test_mount_point_exists(ssh, pi_config):
 
 
 @pytest.mark.hardware
-def test_config_yaml_on_pi(ssh):
-    r = ssh.run(
-        "test -f ~/config.yaml && echo yes "
-        "|| test -f /home/cedric/USBCellular/config.yaml && echo yes"
-    )
+def test_config_yaml_on_pi(probes):
+    r = probes["config"]
     assert "yes" in r.stdout, "config.yaml not found on Pi – run: scp config.yaml cedric@pi:~"
 
 
 @pytest.mark.hardware
-def test_free_memory_above_10mb(ssh):
-    r = ssh.check("awk '/MemAvailable/{print $2}' /proc/meminfo")
-    kb = int(r.stdout.strip())
+def test_free_memory_above_10mb(probes):
+    kb = int(probes["mem_kb"].stdout.strip())
     assert kb > 10_000, f"Only {kb // 1024} MB free RAM – system may be unstable"
 
 
 @pytest.mark.hardware
-def test_free_disk_above_10mb(ssh):
-    r = ssh.check("df / --output=avail | tail -1")
-    kb = int(r.stdout.strip())
+def test_free_disk_above_10mb(probes):
+    blocks, bsize = map(int, probes["disk_free"].stdout.split())
+    kb = blocks * bsize // 1024
     assert kb > 10_000, f"Only {kb // 1024} MB free on rootfs"
 
 
@@ -127,9 +149,8 @@ def test_python_package_on_pi(ssh, pkg):
 # ── Service ───────────────────────────────────────────────────────────────────
 
 @pytest.mark.hardware
-def test_airbridge_service_enabled(ssh):
-    r = ssh.run("systemctl is-enabled airbridge.service 2>/dev/null")
-    status = r.stdout.strip()
+def test_airbridge_service_enabled(probes):
+    status = probes["service"].stdout.strip()
     if status not in ("enabled", "disabled", "static"):
         pytest.xfail(f"airbridge.service not found (status: {status!r}) – not installed yet")
 
@@ -160,16 +181,15 @@ def test_usb_gadget_loads_and_unloads(ssh, pi_config):
     """Load g_mass_storage, verify UDC state, then unload cleanly."""
     disk = pi_config["virtual_disk_path"]
 
-    ssh.run("sudo modprobe -r g_mass_storage")
-    time.sleep(1)
-
-    r = ssh.run(f"sudo modprobe g_mass_storage file={disk} stall=0 removable=1")
-    assert r.returncode == 0, f"gadget load failed: {r.stderr.strip()}"
-
-    r2 = ssh.check("cat /sys/class/udc/*/state")
-    assert r2.stdout.strip() in {"configured", "not attached", "suspended", "powered"}
-
-    ssh.run("sudo modprobe -r g_mass_storage")
+    _, (load_rc, load_out), (state_rc, state), _ = ssh.batch([
+        "sudo modprobe -r g_mass_storage; sleep 1",
+        f"sudo modprobe g_mass_storage file={disk} stall=0 removable=1 2>&1",
+        "cat /sys/class/udc/*/state",
+        "sudo modprobe -r g_mass_storage",
+    ])
+    assert load_rc == 0, f"gadget load failed: {load_out.strip()}"
+    assert state_rc == 0
+    assert state.strip() in {"configured", "not attached", "suspended", "powered"}
 
 
 @pytest.mark.hardware
@@ -179,20 +199,17 @@ def test_disk_mounts_and_unmounts(ssh, pi_config):
     disk = pi_config["virtual_disk_path"]
     mp   = pi_config["mount_point"]
 
-    ssh.run("sudo modprobe -r g_mass_storage")
-    time.sleep(0.5)
-    ssh.run(f"sudo umount {mp}")
-
     mount_cmd = (
         f"sudo mount {disk} {mp}"
         if disk.startswith("/dev/")
         else f"sudo mount -o loop {disk} {mp}"
     )
-    r = ssh.run(mount_cmd)
-    assert r.returncode == 0, f"mount failed: {r.stderr.strip()}"
-
-    r2 = ssh.check(f"ls {mp} | wc -l")
-    assert r2.stdout.strip().isdigit()
-
-    ssh.run(f"sudo umount {mp}")
-    ssh.run(f"sudo modprobe g_mass_storage file={disk} stall=0 removable=1")
+    # One round trip; the unmount and gadget reload run even if mount fails.
+    _, (mount_rc, mount_out), (_, count), _ = ssh.batch([
+        f"sudo modprobe -r g_mass_storage; sleep 0.5; sudo umount {mp} 2>/dev/null",
+        f"{mount_cmd} 2>&1",
+        f"ls {mp} | wc -l",
+        f"sudo umount {mp}; sudo modprobe g_mass_storage file={disk} stall=0 removable=1",
+    ])
+    assert mount_rc == 0, f"mount failed: {mount_out.strip()}"
+    assert count.strip().isdigit()
@@ -1,14 +1,20 @@
 """
 Unit tests – no hardware required.
 Covers: config validation, dependency imports, display helper functions,
-        wifi_manager pure helpers.
+        wifi_manager pure helpers, pi_usb_manager harvest archiving.
 
 Run anywhere:
     pytest tests/test_unit.py
 """
 
+import ftplib
+import io
+import logging
 import os
+import socket
 import sys
+import tempfile
+import zipfile
 import pytest
 import yaml
 
@@ -17,6 +23,7 @@ import yaml
 _HERE = os.path.dirname(__file__)
 for _p in (
     os.path.join(_HERE, "..", "src", "airbridge"),
+    os.path.join(_HERE, "..", "src", "web"),
     os.path.expanduser("~"),
 ):
     if os.path.isdir(_p) and _p not in sys.path:
@@ -26,16 +33,18 @@ _CONFIG_SEARCH = [
     os.path.join(_HERE, "..", "config.yaml"),
     os.path.expanduser("~/config.yaml"),
 ]
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 # ── Config fixture ────────────────────────────────────────────────────────────
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def cfg():
+    """Parse config.yaml once per run, with libyaml when available."""
     for path in _CONFIG_SEARCH:
         if os.path.exists(path):
             with open(path) as f:
-                return yaml.safe_load(f)
+                return yaml.load(f, Loader=_YAML_LOADER)
     pytest.skip("config.yaml not found locally – copy from Pi or run on Pi")
 
 
@@ -139,6 +148,310 @@ def test_rssi_to_csq_min_clamped(wm):
     assert wm.rssi_to_csq(-200) == 0  # far below -90 clamps to 0
 
 
+# FTPSession -------------------------------------------------------------------
+
+class _FakeFTP:
+    """Records connections made by FTPSession; no network."""
+    instances = []
+
+    def __init__(self, timeout=None):
+        self.closed = False
+        _FakeFTP.instances.append(self)
+
+    def connect(self, server, port): pass
+    def login(self, user, pwd): pass
+    def set_pasv(self, on): pass
+    def sendcmd(self, cmd): pass
+    def quit(self): pass
+    def close(self): self.closed = True
+    def size(self, remote): raise ftplib.error_perm("550 no such file")
+
+    def storbinary(self, cmd, fp, blocksize, callback, rest=None):
+        self.stored = (cmd, fp.read())
+        callback(self.stored[1])
+
+
+@pytest.fixture
+def fake_ftp(wm, monkeypatch):
+    _FakeFTP.instances = []
+    monkeypatch.setattr(wm.ftplib, "FTP", _FakeFTP)
+    return _FakeFTP
+
+
+def test_ftp_session_reuses_connection(wm, fake_ftp):
+    with wm.FTPSession("host", 21, "u", "p") as s:
+        assert s.get() is s.get()
+    assert len(fake_ftp.instances) == 1
+    assert fake_ftp.instances[0].closed
+
+
+def test_ftp_session_reconnects_after_drop(wm, fake_ftp):
+    s = wm.FTPSession("host", 21, "u", "p")
+    first = s.get()
+    s.drop()
+    assert s.get() is not first
+    assert len(fake_ftp.instances) == 2
+
+
+def test_upload_ftp_stream_sends_spooled_archive(wm, fake_ftp):
+    spool = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    spool.write(b"zipdata")
+    spool.seek(0)
+    seen = []
+    with wm.FTPSession("host", 21, "u", "p") as s:
+        ok, _ = wm.upload_ftp_stream(s, spool, "logs.zip", remote_path="/in/",
+                                     progress_callback=lambda n, t: seen.append((n, t)))
+    assert ok
+    assert fake_ftp.instances[0].stored == ("STOR /in/logs.zip", b"zipdata")
+    assert seen == [(7, 7)]
+
+
+def test_store_sendfile_streams_from_file_position(wm, tmp_path):
+    path = tmp_path / "logs.zip"
+    path.write_bytes(b"skipme" + bytes(range(200)))
+    ours, theirs = socket.socketpair()
+
+    class _Ftp:
+        def transfercmd(self, cmd, rest):
+            self.cmd = (cmd, rest)
+            return ours
+
+        def voidresp(self):
+            return "226 Transfer complete"
+
+    ftp, counts = _Ftp(), []
+    with open(path, "rb") as fp:
+        fp.seek(6)
+        wm._store_sendfile(ftp, "STOR /logs.zip", fp, 6, counts.append)
+    with theirs:
+        assert theirs.recv(4096) == bytes(range(200))
+    assert ftp.cmd == ("STOR /logs.zip", 6)
+    assert sum(counts) == 200
+
+
+# upload_http ------------------------------------------------------------------
+
+def test_upload_http_chunks_cover_file(wm, monkeypatch, tmp_path):
+    payload = bytes(range(10))
+    path = tmp_path / "log.bin"
+    path.write_bytes(payload)
+    posts = []
+
+    class _Resp:
+        status_code = 200
+
+    def _post(url, data, headers, timeout):
+        posts.append((url, bytes(data)))
+        return _Resp()
+
+    monkeypatch.setattr(wm.requests, "post", _post)
+    ok, _ = wm.upload_http("http://x/upload/log.bin", str(path), chunk_size=4)
+    assert ok
+    assert [u.split("?")[1] for u, _ in posts] == [
+        "offset=0&total=10", "offset=4&total=10", "offset=8&total=10"]
+    assert b"".join(d for _, d in posts) == payload
+
+
+def test_prefetch_chunks_stops_reader_on_close(wm):
+    payload = bytes(range(100))
+    chunks = wm._prefetch_chunks(io.BytesIO(payload), 7)
+    assert next(chunks) == payload[:7]
+    chunks.close()      # must join the reader, not hang on a full queue
+    assert b"".join(wm._prefetch_chunks(io.BytesIO(payload), 7)) == payload
+
+
+def test_prefetch_chunks_reraises_reader_error(wm):
+    class _FailingFile(io.BytesIO):
+        def read(self, n=-1):
+            if self.tell() >= 7:
+                raise OSError(5, "Input/output error")
+            return super().read(n)
+
+    chunks = wm._prefetch_chunks(_FailingFile(bytes(100)), 7)
+    assert next(chunks) == bytes(7)
+    with pytest.raises(OSError):
+        next(chunks)    # must surface the error, not block on q.get()
+
+
+# ── main outbox cache ─────────────────────────────────────────────────────────
+
+@pytest.fixture(scope="module")
+def airbridge_main():
+    cfg_path = next((p for p in _CONFIG_SEARCH if os.path.exists(p)), None)
+    if cfg_path is None:
+        pytest.skip("no config.yaml to import main with")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("AIRBRIDGE_CONFIG", cfg_path)
+        import main as m
+    return m
+
+
+@pytest.fixture
+def outbox(airbridge_main, monkeypatch, tmp_path):
+    monkeypatch.setattr(airbridge_main, "OUTBOX_DIR", str(tmp_path))
+    airbridge_main._invalidate_outbox_cache()
+    yield tmp_path
+    airbridge_main._invalidate_outbox_cache()
+
+
+def _age_dir(path, seconds):
+    st = os.stat(path)
+    ns = st.st_mtime_ns - int(seconds * 1e9)
+    os.utime(path, ns=(ns, ns))
+
+
+def test_scan_outbox_not_cached_within_slack(airbridge_main, outbox):
+    (outbox / "a.log").write_bytes(b"x" * 10)
+    assert airbridge_main._scan_outbox()[1] == 10
+    # Same second, same directory size: only a rescan can see the growth.
+    (outbox / "a.log").write_bytes(b"x" * 25)
+    assert airbridge_main._scan_outbox()[1] == 25
+
+
+def test_invalidate_outbox_cache_forces_rescan(airbridge_main, outbox):
+    (outbox / "a.log").write_bytes(b"x" * 10)
+    _age_dir(outbox, 60)
+    assert airbridge_main._scan_outbox()[1] == 10
+    (outbox / "a.log").write_bytes(b"x" * 25)   # grows in place: same dir key
+    assert airbridge_main._scan_outbox()[1] == 10
+    airbridge_main._invalidate_outbox_cache()
+    assert airbridge_main._scan_outbox()[1] == 25
+
+
+# ── pi_usb_manager harvest ────────────────────────────────────────────────────
+
+@pytest.fixture(scope="module")
+def pum():
+    # The module logs to a file under /home/cedric at import time.
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(logging, "FileHandler", lambda *a, **k: logging.NullHandler())
+        import pi_usb_manager as m
+    return m
+
+
+@pytest.mark.parametrize("prefetch_max", [0, 1 << 20])   # streamed, prefetched
+def test_write_zip_levels_and_stores(pum, monkeypatch, tmp_path, prefetch_max):
+    levels = []
+    real_compressobj = zipfile.zlib.compressobj
+    def _compressobj(level, *a):
+        levels.append(level)
+        return real_compressobj(level, *a)
+    monkeypatch.setattr(zipfile.zlib, "compressobj", _compressobj)
+    monkeypatch.setattr(pum, "PREFETCH_MAX_BYTES", prefetch_max)
+    (tmp_path / "app.log").write_bytes(b"line\n" * 1000)
+    (tmp_path / "syslog.1").write_bytes(b"\x1f\x8b" + bytes(100))   # gzip magic
+    changed = [(str(tmp_path / n), n) for n in ("app.log", "syslog.1")]
+
+    archive = tmp_path / "out.zip"
+    assert pum.USBGadgetManager._write_zip(None, str(archive), changed)
+    assert levels == [pum.ARCHIVE_COMPRESSLEVEL]
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.getinfo("app.log").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("syslog.1").compress_type == zipfile.ZIP_STORED
+        assert zf.testzip() is None
+
+
+@pytest.fixture
+def harvester(pum, monkeypatch, tmp_path):
+    mnt, outbox = tmp_path / "mnt", tmp_path / "outbox"
+    (mnt / "sub").mkdir(parents=True)
+    for i, name in enumerate(["a.txt", "b.txt", "sub/trace.log"]):
+        (mnt / name).write_bytes(b"line\n" * 200 * (i + 1))
+    monkeypatch.setattr(pum, "MOUNT_POINT", str(mnt))
+    monkeypatch.setattr(pum, "OUTBOX_DIR", str(outbox))
+    monkeypatch.setattr(pum, "HARVEST_STATE_PATH", str(tmp_path / "state"))
+    monkeypatch.setattr(pum, "UPLOADED_MANIFEST_PATH", str(tmp_path / "uploaded"))
+    monkeypatch.setattr(pum.os.path, "ismount", lambda p: True)
+    monkeypatch.setattr(pum.USBGadgetManager, "_open_udc_state", lambda self: (-1, None))
+    monkeypatch.setattr(pum.USBGadgetManager, "drop_image_cache", lambda self: None)
+    outbox.mkdir()
+    return pum.USBGadgetManager, outbox, tmp_path / "uploaded"
+
+
+def _harvest_once(cls, outbox):
+    """Run one harvest with a fresh manager; return (archive, members) for the
+    archive it wrote, or None, and take the archive out of the outbox."""
+    before = set(outbox.iterdir())
+    assert cls().harvest_files()
+    new = set(outbox.iterdir()) - before
+    if not new:
+        return None
+    (archive,) = new
+    with zipfile.ZipFile(archive) as zf:
+        names = sorted(zf.namelist())
+    archive.unlink()
+    return archive.name, names
+
+
+def test_harvest_is_incremental_after_delivery(harvester):
+    cls, outbox, manifest = harvester
+    name, files = _harvest_once(cls, outbox)
+    assert files == ["a.txt", "b.txt", "sub/trace.log"]
+    manifest.write_text(name + "\n")
+    assert _harvest_once(cls, outbox) is None
+
+
+def test_harvest_starts_over_after_undelivered_loss(harvester):
+    cls, outbox, manifest = harvester
+    _harvest_once(cls, outbox)          # archive vanishes, never uploaded
+    _, files = _harvest_once(cls, outbox)
+    assert files == ["a.txt", "b.txt", "sub/trace.log"]
+
+
+# ── web_status helpers ────────────────────────────────────────────────────────
+
+@pytest.fixture(scope="module")
+def ws():
+    import web_status as m
+    return m
+
+
+def test_ttl_cache_is_bounded_and_keys_kwargs(ws):
+    calls = []
+
+    @ws.ttl_cache(60, maxsize=3)
+    def f(x, scale=1):
+        calls.append((x, scale))
+        return x * scale
+
+    assert [f(i) for i in range(5)] == [0, 1, 2, 3, 4]
+    assert len(calls) == 5
+    assert f(4) == 4 and len(calls) == 5            # newest entry kept
+    assert f(0) == 0 and len(calls) == 6            # oldest evicted
+    assert f(2, scale=10) == 20 and f(2, scale=10) == 20
+    assert calls[-1] == (2, 10) and len(calls) == 7
+
+
+def test_api_logs_clamps_line_count(ws, monkeypatch):
+    asked = []
+    monkeypatch.setattr(ws, "get_logs", lambda n: asked.append(n) or "")
+    client = ws.app.test_client()
+    for q in ("?n=100000", "?n=-5", "?n=20", ""):
+        assert client.get("/api/logs" + q).status_code == 200
+    assert asked == [ws.LOG_LINES_MAX, 1, 20, 50]
+
+
+def test_upload_progress_round_trip(airbridge_main, ws, monkeypatch, tmp_path):
+    progress = tmp_path / "progress.bin"
+    upload = tmp_path / "harvest_1.zip"
+    upload.write_bytes(bytes(4000))
+    monkeypatch.setattr(airbridge_main, "PROGRESS_PATH", str(progress))
+    monkeypatch.setattr(airbridge_main, "_prog_fd", -1)
+    monkeypatch.setattr(ws, "_PROGRESS_FILE", str(progress))
+    try:
+        airbridge_main._progress_begin(str(upload))
+        assert ws.get_upload_progress()["bytes_sent"] == 0
+        airbridge_main._progress_update(1000)
+        assert ws.get_upload_progress() == {
+            "file": "harvest_1.zip", "bytes_sent": 1000,
+            "filesize": 4000, "pct": 25,
+        }
+        airbridge_main._progress_end()
+        assert ws.get_upload_progress() is None
+    finally:
+        os.close(airbridge_main._prog_fd)
+
+
 # ── display_handler pure-Python helpers ───────────────────────────────────────
 
 @pytest.fixture(scope="module")
@@ -29,10 +29,28 @@ SECTOR_WAIT  = 15   # seconds to wait for Pi to register write activity
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _local(cmd: str, check: bool = False) -> subprocess.CompletedProcess:
-    """Run a local shell command; never raises by default."""
-    return subprocess.run(cmd, shell=True, capture_output=True, text=True,
-                          check=check)
+def _local(*argv: str, check: bool = False) -> subprocess.CompletedProcess:
+    """Run a local command (argv, no shell); never raises by default."""
+    return subprocess.run(argv, capture_output=True, text=True, check=check)
+
+
+def _wait_until(predicate, timeout: float, first: float = 0.1,
+                cap: float = 1.0) -> bool:
+    """
+    Poll *predicate* with exponential backoff (first, 2×first, … capped at
+    *cap*) until it returns true or *timeout* seconds pass.  Returns as soon
+    as the condition holds instead of after a fixed worst-case sleep.
+    """
+    deadline = time.monotonic() + timeout
+    delay = first
+    while True:
+        if predicate():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, cap)
 
 
 def _write_sector_count(ssh) -> int:
@@ -82,12 +100,12 @@ def test_write_file_and_verify(ssh, usb_device):
     then verify that the Pi's diskstat write counter increased.
     """
     os.makedirs(MOUNT_TMP, exist_ok=True)
-    _local(f"sudo umount {MOUNT_TMP}")   # clear any stale mount
+    _local("sudo", "umount", MOUNT_TMP)   # clear any stale mount
 
     # Try partition-1 first, then bare device
     mounted_as = None
     for target in [f"{usb_device}1", usb_device]:
-        r = _local(f"sudo mount {target} {MOUNT_TMP}")
+        r = _local("sudo", "mount", target, MOUNT_TMP)
         if r.returncode == 0:
             mounted_as = target
             break
@@ -115,18 +133,12 @@ def test_write_file_and_verify(ssh, usb_device):
         _local("sync", check=True)
         time.sleep(0.5)
     finally:
-        _local(f"sudo umount {MOUNT_TMP}")
+        _local("sudo", "umount", MOUNT_TMP)
 
     # Poll Pi's write-sector counter
     baseline = _write_sector_count(ssh)
-    deadline = time.time() + SECTOR_WAIT
-    detected = False
-    while time.time() < deadline:
-        time.sleep(1)
-        current = _write_sector_count(ssh)
-        if current != baseline:
-            detected = True
-            break
+    detected = _wait_until(lambda: _write_sector_count(ssh) != baseline,
+                           SECTOR_WAIT)
 
     assert detected, (
         f"Pi did not register any write activity on mmcblk0p3 within {SECTOR_WAIT} s.\n"
@@ -1,15 +1,25 @@
+import ctypes
 import os
+import select
 import time
 import subprocess
 import yaml
 
+# libyaml's C loader when PyYAML was built with it; same results, far faster.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # Load configuration from shared config file
 with open("config.yaml", "r") as ymlfile:
-    cfg = yaml.safe_load(ymlfile)
+    cfg = yaml.load(ymlfile, Loader=_YAML_LOADER)
 
 DISK_IMAGE = cfg['virtual_disk_path']
 MOUNT_POINT = cfg['mount_point']
 QUIET_WINDOW = cfg.get('quiet_window_seconds', 30)
+IN_MODIFY = 0x00000002
+# Kept open between polls; the disk's line is located with a bytes search
+# for " <name> " rather than splitting every line of the file.
+_diskstats = None
+_DISK_KEY = f" {os.path.basename(DISK_IMAGE)} ".encode()
 
 def run_cmd(cmd, check=True):
     """Run a shell command and return output."""
@@ -77,20 +87,37 @@ def unmount_disk_image():
     """Unmount the disk image."""
     print(f"Unmounting {MOUNT_POINT}...")
     run_cmd(["sudo", "sync"])
-    time.sleep(1)  # Allow file handles to close
-    return run_cmd(["sudo", "umount", MOUNT_POINT])
+    # Retry on EBUSY with backoff instead of a fixed sleep: a healthy
+    # unmount succeeds on the first try, a straggling handle gets ~2 s.
+    for delay in (0.05, 0.1, 0.2, 0.5, 1.0):
+        r = subprocess.run(["sudo", "umount", MOUNT_POINT], capture_output=True)
+        if r.returncode == 0:
+            return True
+        time.sleep(delay)
+    # Still busy: detach now and let the kernel finish once handles close.
+    return run_cmd(["sudo", "umount", "-l", MOUNT_POINT])
+
+# The UDC belongs to the controller driver and outlives gadget reloads, so
+# its state file is opened once and re-read with pread() on every poll.
+_udc_state_fd = None
 
 def get_udc_state():
     """Get the USB device controller state."""
+    global _udc_state_fd
     try:
-        udc_path = "/sys/class/udc"
-        udcs = os.listdir(udc_path)
-        if udcs:
-            state_file = os.path.join(udc_path, udcs[0], "state")
-            with open(state_file, "r") as f:
-                return f.read().strip()
+        if _udc_state_fd is None:
+            udc_path = "/sys/class/udc"
+            udcs = os.listdir(udc_path)
+            if not udcs:
+                return "unknown"
+            _udc_state_fd = os.open(os.path.join(udc_path, udcs[0], "state"),
+                                    os.O_RDONLY)
+        return os.pread(_udc_state_fd, 32, 0).decode().strip()
     except Exception as e:
         print(f"Error reading UDC state: {e}")
+        if _udc_state_fd is not None:
+            os.close(_udc_state_fd)
+            _udc_state_fd = None
     return "unknown"
 
 def get_disk_activity():
@@ -105,59 +132,119 @@ def get_disk_activity():
         # For block devices, read write sectors from /proc/diskstats
         # Format: major minor name reads ... writes ...
         # Field 10 (index 9) is sectors written
-        device_name = os.path.basename(DISK_IMAGE)  # e.g., "mmcblk0p3"
+        global _diskstats
         try:
-            with open("/proc/diskstats", "r") as f:
-                for line in f:
-                    parts = line.split()
-                    if len(parts) >= 10 and parts[2] == device_name:
-                        return int(parts[9])  # sectors written
+            if _diskstats is None:
+                _diskstats = open("/proc/diskstats", "rb", buffering=0)
+            _diskstats.seek(0)
+            data = _diskstats.readall()
+            i = data.find(_DISK_KEY)
+            if i >= 0:
+                # name reads rmerged rsectors rms writes wmerged wsectors ...
+                parts = data[i:data.find(b"\n", i)].split(None, 8)
+                return int(parts[7])  # sectors written
         except Exception:
             pass
         return 0
 
+def iter_files(root=MOUNT_POINT):
+    """
+    Yield (rel_path, DirEntry) for every regular file under *root* as the
+    walk reaches it, so consumers can start on the first file before the
+    rest of the tree has been read.
+    """
+    # scandir's DirEntry already knows each entry's type and caches its
+    # stat, so each file costs one stat instead of walk's plus getsize's.
+    stack = [(root, "")]
+    while stack:
+        path, rel_root = stack.pop()
+        with os.scandir(path) as it:
+            for entry in it:
+                rel_path = rel_root + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel_path + "/"))
+                elif entry.is_file(follow_symlinks=False):
+                    yield rel_path, entry
+
+
 def list_files():
-    """List all files in the mounted directory and return their paths."""
+    """Print every file in the mounted directory; return how many there were."""
     print(f"\n=== Files in {MOUNT_POINT} ===")
-    file_list = []
-    for root, dirs, files in os.walk(MOUNT_POINT):
-        # Get relative path from mount point
-        rel_root = os.path.relpath(root, MOUNT_POINT)
-        if rel_root == ".":
-            rel_root = ""
-
-        for f in files:
-            filepath = os.path.join(root, f)
-            size = os.path.getsize(filepath)
-            rel_path = os.path.join(rel_root, f) if rel_root else f
-            print(f"  {rel_path} ({size} bytes)")
-            file_list.append(filepath)
-
-    if not file_list:
+    count = 0
+    for rel_path, entry in iter_files():
+        size = entry.stat(follow_symlinks=False).st_size
+        print(f"  {rel_path} ({size} bytes)")
+        count += 1
+
+    if not count:
         print("  (empty)")
     print("=" * 40)
-    return file_list
+    return count
 
 
+def watch_disk_image():
+    """
+    Return an inotify fd that becomes readable when the gadget writes to a
+    file-backed DISK_IMAGE, or None (block device, or inotify unavailable).
+    """
+    if not os.path.isfile(DISK_IMAGE):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, DISK_IMAGE.encode(), IN_MODIFY) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
 def monitor_transfers():
     """Monitor for file transfers and detect quiet periods."""
     print(f"\nMonitoring for file transfers (quiet window: {QUIET_WINDOW}s)...")
     print("Connect the Pi to a host via USB and copy some files.")
     print("Press Ctrl+C to stop monitoring.\n")
 
+    ino_fd = watch_disk_image()
+    try:
+        return _monitor_loop(ino_fd)
+    finally:
+        if ino_fd is not None:
+            os.close(ino_fd)
+
+def _monitor_loop(ino_fd):
     last_activity = get_disk_activity()
     last_change_time = time.time()
     transfer_detected = False
 
     while True:
-        current_activity = get_disk_activity()
+        if ino_fd is not None:
+            # Sleep in the kernel until the image is written, waking at most
+            # every 5 s for the status line or when the quiet window is due.
+            quiet_time = time.time() - last_change_time
+            timeout = 5.0
+            if transfer_detected:
+                timeout = max(0.0, min(timeout, QUIET_WINDOW - quiet_time))
+            changed = bool(select.select([ino_fd], [], [], timeout)[0])
+            if changed:
+                try:
+                    while os.read(ino_fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+        else:
+            # Block devices raise no inotify events: poll diskstats.
+            current_activity = get_disk_activity()
+            changed = current_activity != last_activity
+            last_activity = current_activity
         udc_state = get_udc_state()
 
-        if current_activity != last_activity:
+        if changed:
             if not transfer_detected:
                 print(f"[{time.strftime('%H:%M:%S')}] Transfer activity detected!")
                 transfer_detected = True
-            last_activity = current_activity
             last_change_time = time.time()
 
         quiet_time = time.time() - last_change_time
@@ -171,7 +258,8 @@ def monitor_transfers():
             print(f"\n[{time.strftime('%H:%M:%S')}] Quiet window reached ({QUIET_WINDOW}s)")
             return True
 
-        time.sleep(1)
+        if ino_fd is None:
+            time.sleep(1)
 
 def main():
     print("=== USB Mass Storage Test ===\n")